@@ -0,0 +1,97 @@
+import math
+import numpy as np
+import torch
+import torch.nn.functional as F
+from PIL import Image
+
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+class ToUint8Tensor:
+    """
+    Per-sample transform that only moves raw bytes: PIL image or HxWx3 array -> HxWx3 uint8 tensor.
+
+    Images are resized to `size` (width, height) when needed so samples can be stacked by
+    the default collate function; all float work is left to `BatchAugment`.
+    """
+    def __init__(self, size=(256, 256)):
+        self.size = tuple(size)
+
+    def __call__(self, image):
+        if not isinstance(image, Image.Image):
+            image = np.asarray(image)
+            if image.shape[1::-1] == self.size:
+                return torch.from_numpy(np.array(image, dtype=np.uint8))
+            image = Image.fromarray(image)
+        if image.size != self.size:
+            image = image.resize(self.size)
+        return torch.from_numpy(np.array(image, dtype=np.uint8))
+
+class BatchAugment:
+    """
+    Batched replacement for RandomResizedCrop + RandomHorizontalFlip + ToTensor + Normalize.
+
+    Takes a collated NxHxWx3 uint8 batch and returns an Nx3xSxS float batch. In training
+    mode every sample gets its own random crop box and flip, folded into one affine grid so
+    the whole batch is resampled with a single `grid_sample` call. In eval mode the batch
+    is resized as a whole. BxTxHxWx3 clip batches (see ClipDataset) get one crop and flip
+    per clip, so frames stay aligned over time. Random parameters come from a private
+    generator seeded with `seed`, so runs are reproducible regardless of the DataLoader
+    worker count.
+    """
+    def __init__(self, output_size=224, scale=(0.08, 1.0), ratio=(3 / 4, 4 / 3), flip_p=0.5,
+                 mean=IMAGENET_MEAN, std=IMAGENET_STD, seed=42):
+        self.output_size = output_size
+        self.scale = scale
+        self.log_ratio = (math.log(ratio[0]), math.log(ratio[1]))
+        self.flip_p = flip_p
+        # (x / 255 - mean) / std == x * scale + shift
+        std = torch.tensor(std, dtype=torch.float32)
+        self.norm_scale = (1.0 / (255.0 * std)).view(1, 3, 1, 1)
+        self.norm_shift = (-torch.tensor(mean, dtype=torch.float32) / std).view(1, 3, 1, 1)
+        self.generator = torch.Generator().manual_seed(seed)
+
+    def state_dict(self):
+        return {'generator': self.generator.get_state()}
+
+    def load_state_dict(self, state):
+        self.generator.set_state(state['generator'])
+
+    def _crop_theta(self, n):
+        g = self.generator
+        area = torch.empty(n).uniform_(self.scale[0], self.scale[1], generator=g)
+        aspect = torch.exp(torch.empty(n).uniform_(self.log_ratio[0], self.log_ratio[1], generator=g))
+        # Crop width/height as fractions of the source image
+        w = torch.sqrt(area * aspect).clamp(max=1.0)
+        h = torch.sqrt(area / aspect).clamp(max=1.0)
+        # Crop centres in normalized [-1, 1] coordinates, kept inside the image
+        cx = (torch.rand(n, generator=g) * 2 - 1) * (1 - w)
+        cy = (torch.rand(n, generator=g) * 2 - 1) * (1 - h)
+        flip = torch.rand(n, generator=g) < self.flip_p
+        sx = torch.where(flip, -w, w)
+
+        theta = torch.zeros(n, 2, 3)
+        theta[:, 0, 0] = sx
+        theta[:, 0, 2] = cx
+        theta[:, 1, 1] = h
+        theta[:, 1, 2] = cy
+        return theta
+
+    def __call__(self, batch, train=True):
+        if batch.dim() == 5:
+            # BxTxHxWx3 clips: one crop and flip per clip, shared by all of its frames
+            b, t = batch.shape[:2]
+            theta = self._crop_theta(b).repeat_interleave(t, dim=0) if train else None
+            return self._apply(batch.flatten(0, 1), train, theta).unflatten(0, (b, t))
+        return self._apply(batch, train)
+
+    def _apply(self, batch, train, theta=None):
+        x = batch.permute(0, 3, 1, 2).float()
+        size = self.output_size
+        if train:
+            theta = (self._crop_theta(x.size(0)) if theta is None else theta).to(x.device)
+            grid = F.affine_grid(theta, (x.size(0), 3, size, size), align_corners=False)
+            x = F.grid_sample(x, grid, mode='bilinear', padding_mode='border', align_corners=False)
+        elif x.shape[-2:] != (size, size):
+            x = F.interpolate(x, size=(size, size), mode='bilinear', align_corners=False, antialias=True)
+        return x.mul_(self.norm_scale.to(x.device)).add_(self.norm_shift.to(x.device)).contiguous()
@@ -0,0 +1,268 @@
+import os
+import csv
+import json
+import time
+import hashlib
+import argparse
+import cv2
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, IterableDataset, get_worker_info
+from data_preprocessing import VIDEO_EXTENSIONS, iter_frames, default_frame_pipeline, video_signature, load_manifest, save_manifest
+from batch_augment import BatchAugment
+from simple_cnn import load_model
+
+MANIFEST_NAME = '.classify_manifest.json'
+FRAME_FIELDS = ('video', 'frame', 'time_s', 'label', 'confidence', 'model')
+SEGMENT_FIELDS = ('video', 'label', 'start_frame', 'end_frame', 'start_s', 'end_s', 'num_frames', 'mean_confidence', 'model')
+
+def find_videos(videos_dir):
+    """(relative path, absolute path) of every video under `videos_dir`, recursively, sorted."""
+    videos = []
+    for root, _, files in os.walk(videos_dir):
+        for name in files:
+            if name.endswith(VIDEO_EXTENSIONS):
+                path = os.path.join(root, name)
+                videos.append((os.path.relpath(path, videos_dir), path))
+    return sorted(videos)
+
+class VideoChunks(IterableDataset):
+    """
+    Decoded frames of a list of videos, in chunks of up to `chunk_size` frames.
+
+    Used with `DataLoader(batch_size=None, num_workers=N)`: each worker decodes its own
+    share of the videos, so decoding runs in N processes while the main process only runs
+    the model. Frames go through the same 256x256 resize as extraction and are returned as
+    RGB uint8, which keeps inter-process transfers small. Each chunk is a dict with the
+    video id, its fps, the frames, their indices in the video, whether it is the video's
+    last chunk and an error message if decoding failed.
+    """
+    def __init__(self, videos, stride=1, chunk_size=64, size=(256, 256), seek=False):
+        self.videos = list(videos)
+        self.stride = stride
+        self.chunk_size = chunk_size
+        self.size = tuple(size)
+        self.seek = seek
+
+    def _chunk(self, video_id, fps, frames, indices, last, error=None):
+        width, height = self.size
+        return {
+            'video': video_id,
+            'fps': fps,
+            'frames': np.stack(frames) if frames else np.zeros((0, height, width, 3), dtype=np.uint8),
+            'indices': np.asarray(indices, dtype=np.int64),
+            'last': last,
+            'error': error,
+        }
+
+    def __iter__(self):
+        info = get_worker_info()
+        videos = self.videos if info is None else self.videos[info.id::info.num_workers]
+        pipeline = default_frame_pipeline(self.size)
+        for video_id, path in videos:
+            try:
+                cap = cv2.VideoCapture(path)
+                fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+                cap.release()
+                frames, indices = [], []
+                for index, frame in iter_frames(path, self.stride, self.seek):
+                    frames.append(cv2.cvtColor(pipeline(frame), cv2.COLOR_BGR2RGB))
+                    indices.append(index)
+                    if len(frames) == self.chunk_size:
+                        yield self._chunk(video_id, fps, frames, indices, False)
+                        frames, indices = [], []
+                yield self._chunk(video_id, fps, frames, indices, True)
+            except Exception as e:
+                yield self._chunk(video_id, 0.0, [], [], True, error=str(e))
+
+def _init_decode_worker(worker_id):
+    # One video per worker at a time; OpenCV's own thread pool would only oversubscribe the cores
+    cv2.setNumThreads(1)
+    torch.set_num_threads(1)
+
+def segments_from_frames(frame_rows):
+    """Merge consecutive per-frame predictions with the same label into segments."""
+    segments = []
+    for row in frame_rows:
+        last = segments[-1] if segments else None
+        if last is not None and last['label'] == row['label']:
+            last['end_frame'] = row['frame']
+            last['end_s'] = row['time_s']
+            last['num_frames'] += 1
+            last['mean_confidence'] += row['confidence']
+        else:
+            segments.append({'video': row['video'], 'label': row['label'], 'start_frame': row['frame'], 'end_frame': row['frame'],
+                             'start_s': row['time_s'], 'end_s': row['time_s'], 'num_frames': 1, 'mean_confidence': row['confidence'],
+                             'model': row['model']})
+    for segment in segments:
+        segment['mean_confidence'] /= segment['num_frames']
+    return segments
+
+class PerVideoResults:
+    """
+    Writes one file per video under `output_dir/frames/` and `output_dir/segments/`.
+
+    Each file is written under a temporary name and renamed into place, so reprocessing
+    a video (after a model or video change, or a crash before the manifest was saved)
+    replaces its rows instead of duplicating them.
+    """
+    extension = None
+    fields = {'frames': FRAME_FIELDS, 'segments': SEGMENT_FIELDS}
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+
+    def write(self, video_id, frame_rows, segment_rows):
+        name = video_id.replace(os.sep, '__') + self.extension
+        for kind, rows in (('frames', frame_rows), ('segments', segment_rows)):
+            folder = os.path.join(self.output_dir, kind)
+            os.makedirs(folder, exist_ok=True)
+            tmp_path = os.path.join(folder, name + '.tmp')
+            self._write_file(tmp_path, self.fields[kind], rows)
+            os.replace(tmp_path, os.path.join(folder, name))
+
+class CsvResults(PerVideoResults):
+    """One CSV per video; concatenate the files of a folder to get the full table."""
+    extension = '.csv'
+
+    def _write_file(self, path, fields, rows):
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(rows)
+
+class ParquetResults(PerVideoResults):
+    """One Parquet file per video; each folder reads back as a single dataset with pyarrow or pandas."""
+    extension = '.parquet'
+
+    def __init__(self, output_dir):
+        super().__init__(output_dir)
+        import pyarrow
+        import pyarrow.parquet
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+
+    def _write_file(self, path, fields, rows):
+        self.pq.write_table(self.pa.table({field: [row[field] for row in rows] for field in fields}), path)
+
+RESULT_WRITERS = {'csv': CsvResults, 'parquet': ParquetResults}
+
+def classify_videos(videos_dir, model_path, output_dir, stride=1, batch_size=128, num_workers=None, output_format='csv',
+                    input_size=224, device='cpu', seek=False):
+    """
+    Classify every `stride`-th frame of every video under `videos_dir` and write per-frame
+    and per-segment predictions to `output_dir`.
+
+    A manifest in `output_dir` records each finished video with its size, mtime, stride and
+    the model file, so a rerun skips videos that are already done and unchanged.
+
+    Parameters:
+        videos_dir (str): Folder searched recursively for videos (VIDEO_EXTENSIONS).
+        model_path (str): Any model `simple_cnn.load_model` understands (single-frame models).
+        output_dir (str): Where results and the manifest are written.
+        stride (int): Classify every `stride`-th frame.
+        batch_size (int): Frames per forward pass (also the decode chunk size).
+        num_workers (int): Decode processes (None: all cores but one; 0 decodes in-process).
+        output_format (str): 'csv' or 'parquet' (needs pyarrow).
+        input_size (int): Model input size.
+        device (str): Torch device for the model.
+        seek (bool): Seek between kept frames instead of grabbing every frame (see `iter_frames`).
+
+    Returns:
+        dict: Videos done, skipped and failed, frames classified and frames/sec.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    writer = RESULT_WRITERS[output_format](output_dir)
+    model, classes = load_model(model_path, device)
+    if getattr(model, 'arch', None) == 'temporal':
+        raise ValueError("batch_classify runs single-frame models; clip models need a StreamingClassifier (see test_rt.py)")
+    if num_workers is None:
+        num_workers = max(1, (os.cpu_count() or 2) - 1)
+
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+    model_stat = os.stat(model_path)
+    model_signature = {'path': os.path.abspath(model_path), 'size': model_stat.st_size, 'mtime_ns': model_stat.st_mtime_ns}
+    # Short id of the model file written with every row, so results of different models can be told apart
+    model_id = f"{os.path.basename(model_path)}@{hashlib.sha1(json.dumps(model_signature, sort_keys=True).encode()).hexdigest()[:10]}"
+
+    videos = find_videos(videos_dir)
+    signatures = {video_id: video_signature(path, stride) for video_id, path in videos}
+    todo = [(video_id, path) for video_id, path in videos
+            if manifest.get(video_id, {}).get('signature') != signatures[video_id] or manifest[video_id].get('model') != model_signature]
+    print(f"{len(todo)} videos to classify, {len(videos) - len(todo)} already done")
+
+    loader = DataLoader(VideoChunks(todo, stride, batch_size, seek=seek), batch_size=None, num_workers=min(num_workers, len(todo)),
+                        worker_init_fn=_init_decode_worker)
+    transform = BatchAugment(input_size)
+    pending = {}
+    done = 0
+    failed = 0
+    total_frames = 0
+    start = time.perf_counter()
+
+    for chunk in loader:
+        video_id = chunk['video']
+        rows = pending.setdefault(video_id, [])
+        if chunk['error'] is not None:
+            print(f"Error classifying {video_id}: {chunk['error']}")
+            pending.pop(video_id)
+            failed += 1
+            continue
+
+        if len(chunk['indices']):
+            with torch.no_grad():
+                logits = model(transform(chunk['frames'].to(device), train=False))
+                confidence, predicted = torch.softmax(logits.float(), dim=1).max(1)
+            fps = float(chunk['fps'])
+            for index, label, conf in zip(chunk['indices'].tolist(), predicted.tolist(), confidence.tolist()):
+                rows.append({
+                    'video': video_id,
+                    'frame': index,
+                    'time_s': index / fps if fps > 0 else None,
+                    'label': classes[label] if classes is not None else str(label),
+                    'confidence': conf,
+                    'model': model_id,
+                })
+
+        if chunk['last']:
+            rows = pending.pop(video_id)
+            writer.write(video_id, rows, segments_from_frames(rows))
+            manifest[video_id] = {'signature': signatures[video_id], 'model': model_signature, 'frames': len(rows)}
+            save_manifest(manifest, manifest_path)
+            done += 1
+            total_frames += len(rows)
+            elapsed = time.perf_counter() - start
+            print(f"[{done + failed}/{len(todo)}] {video_id}: {len(rows)} frames ({total_frames / max(elapsed, 1e-9):.1f} frames/s overall)")
+
+    elapsed = time.perf_counter() - start
+    summary = {
+        'videos_done': done,
+        'videos_skipped': len(videos) - len(todo),
+        'videos_failed': failed,
+        'frames': total_frames,
+        'elapsed_s': elapsed,
+        'frames_per_sec': total_frames / max(elapsed, 1e-9),
+    }
+    print(f"Classified {total_frames} frames from {done} videos in {elapsed:.1f}s ({summary['frames_per_sec']:.1f} frames/s)")
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline gesture classification of a folder of recorded videos.")
+    parser.add_argument("videos_dir", help="Folder searched recursively for videos")
+    parser.add_argument("--model", default="gesture_model.pth", help="Checkpoint or TorchScript model")
+    parser.add_argument("--output-dir", default="predictions")
+    parser.add_argument("--format", choices=sorted(RESULT_WRITERS), default="csv")
+    parser.add_argument("--stride", type=int, default=5, help="Classify every n-th frame")
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--num-workers", type=int, help="Decode processes (default: all cores but one)")
+    parser.add_argument("--input-size", type=int, default=224)
+    parser.add_argument("--seek", action="store_true", help="Seek between kept frames (faster for large strides on seekable containers)")
+    parser.add_argument("--device", default="cuda:0" if torch.cuda.is_available() else "cpu")
+    args = parser.parse_args()
+
+    try:
+        classify_videos(args.videos_dir, args.model, args.output_dir, args.stride, args.batch_size, args.num_workers,
+                        args.format, args.input_size, args.device, args.seek)
+    except ImportError as e:
+        parser.error(f"--format {args.format} is unavailable: {e}")
@@ -0,0 +1,279 @@
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import contextlib
+import cv2
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from torch.utils.data import DataLoader, TensorDataset
+from data_preprocessing import process_videos_in_folder
+from gesture_dataset import GestureDataset
+from batch_augment import BatchAugment, ToUint8Tensor
+from fast_preprocess import FramePreprocessor, synthetic_frame
+from simple_cnn import SimpleCNN
+from utils import create_dataloaders
+from train import train_model
+
+# Metric name suffix -> whether a larger value is better; used by `compare`
+METRIC_DIRECTIONS = (('_per_sec', True), ('_fps', True), ('_ms', False), ('_s', False))
+
+def make_synthetic_corpus(video_dir, num_classes=3, videos_per_class=4, frames_per_video=90, size=(320, 240), fps=30):
+    """
+    Write a small, deterministic video corpus laid out like the real one: `video_dir/<class>/<class>_vid<n>.avi`.
+
+    Every video shows a moving coloured shape over a gradient background, so JPEG sizes
+    and decode costs are close to camera footage while the content stays reproducible.
+
+    Returns:
+        int: Total number of frames written.
+    """
+    width, height = size
+    for c in range(num_classes):
+        class_dir = os.path.join(video_dir, f'class{c}')
+        os.makedirs(class_dir, exist_ok=True)
+        for v in range(videos_per_class):
+            background = synthetic_frame(width, height, seed=c * videos_per_class + v)
+            writer = cv2.VideoWriter(os.path.join(class_dir, f'class{c}_vid{v}.avi'), cv2.VideoWriter_fourcc(*'MJPG'), fps, size)
+            for i in range(frames_per_video):
+                frame = background.copy()
+                x = int((i / frames_per_video) * (width - 60))
+                cv2.rectangle(frame, (x, height // 3), (x + 60, height // 3 + 60), (40 * c, 255 - 40 * c, 128), -1)
+                writer.write(frame)
+            writer.release()
+    return num_classes * videos_per_class * frames_per_video
+
+def bench_extraction(video_dir, frames_dir, frame_interval=5, num_workers=None):
+    """Decode and extract the whole corpus into `frames_dir/<class>/<video>/`, from scratch."""
+    shutil.rmtree(frames_dir, ignore_errors=True)
+    decoded = 0
+    saved = 0
+    start = time.perf_counter()
+    for class_name in sorted(os.listdir(video_dir)):
+        class_videos = os.path.join(video_dir, class_name)
+        for video in os.listdir(class_videos):
+            capture = cv2.VideoCapture(os.path.join(class_videos, video))
+            decoded += int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+            capture.release()
+        saved += sum(process_videos_in_folder(class_videos, os.path.join(frames_dir, class_name), frame_interval, num_workers).values())
+    elapsed = time.perf_counter() - start
+    return {
+        'elapsed_s': elapsed,
+        'frames_saved': saved,
+        'decoded_fps': decoded / elapsed,
+        'saved_fps': saved / elapsed,
+    }
+
+def bench_dataloader(frames_dir, worker_counts=(0, 2, 4), batch_size=32, epochs=2):
+    """
+    Samples/sec through `create_dataloaders`' training loader for each worker count.
+
+    Each epoch is timed from iterator creation, so worker start-up is included as it is
+    in real training; the best epoch is reported.
+    """
+    dataset = GestureDataset(frames_dir, transform=ToUint8Tensor((256, 256)), index_path=False)
+    results = {}
+    for num_workers in worker_counts:
+        train_loader, _, _ = create_dataloaders(dataset, batch_size, split_ratio=(1.0, 0.0, 0.0), num_workers=num_workers)
+        best = 0.0
+        for _ in range(epochs):
+            start = time.perf_counter()
+            samples = sum(labels.numel() for _, labels in train_loader)
+            best = max(best, samples / (time.perf_counter() - start))
+        results[f'workers_{num_workers}'] = {'samples_per_sec': best}
+    return results
+
+def bench_training(num_classes=3, batch_size=32, steps=20, input_size=224, arch='gap', amp=False, channels_last=False):
+    """
+    Optimizer steps/sec of `train_model` on in-memory uint8 batches with BatchAugment,
+    so only the training loop itself is measured. The first epoch is a warm-up.
+    """
+    generator = torch.Generator().manual_seed(0)
+    images = torch.randint(0, 256, (batch_size * steps, 256, 256, 3), dtype=torch.uint8, generator=generator)
+    labels = torch.randint(0, num_classes, (batch_size * steps,), generator=generator)
+    train_loader = DataLoader(TensorDataset(images, labels), batch_size=batch_size, shuffle=True)
+    val_loader = DataLoader(TensorDataset(images[:batch_size], labels[:batch_size]), batch_size=batch_size)
+
+    torch.manual_seed(0)
+    model = SimpleCNN(num_classes, arch=arch)
+    optimizer = optim.Adam(model.parameters(), lr=1e-4)
+    scheduler = optim.lr_scheduler.StepLR(optimizer, step_size=7)
+    with tempfile.TemporaryDirectory() as tmp:
+        kwargs = dict(batch_transform=BatchAugment(input_size), amp=amp, channels_last=channels_last,
+                      checkpoint_path=os.path.join(tmp, 'bench.pth'), early_stopping_patience=10)
+        with contextlib.redirect_stdout(io.StringIO()):
+            train_model(model, train_loader, val_loader, nn.CrossEntropyLoss(), optimizer, scheduler, 1, 'cpu', **kwargs)
+            start = time.perf_counter()
+            train_model(model, train_loader, val_loader, nn.CrossEntropyLoss(), optimizer, scheduler, 1, 'cpu', **kwargs)
+            elapsed = time.perf_counter() - start
+    return {'steps_per_sec': steps / elapsed, 'samples_per_sec': steps * batch_size / elapsed}
+
+def _percentiles(timings):
+    return {f'p{p}_ms': float(np.percentile(timings, p)) for p in (50, 90, 99)}
+
+def bench_inference(num_classes=10, input_size=224, batch_sizes=(8, 32), iterations=100, warmup=10, arch='gap'):
+    """
+    SimpleCNN latency percentiles: single frames the way test_rt.py runs them (BGR frame ->
+    FramePreprocessor -> forward), and pre-batched tensors for offline/server use.
+    """
+    model = SimpleCNN(num_classes, arch=arch).eval()
+    preprocessor = FramePreprocessor(input_size)
+    frame = synthetic_frame()
+    results = {}
+
+    timings = []
+    with torch.no_grad():
+        for i in range(warmup + iterations):
+            start = time.perf_counter()
+            model(preprocessor(frame)).argmax(1).item()
+            if i >= warmup:
+                timings.append((time.perf_counter() - start) * 1000.0)
+    results['single_frame'] = dict(_percentiles(timings), frames_per_sec=1000.0 / float(np.mean(timings)))
+
+    for batch_size in batch_sizes:
+        inputs = torch.randn(batch_size, 3, input_size, input_size)
+        timings = []
+        with torch.no_grad():
+            # Large batches are slow enough that a couple of warm-up runs suffice
+            batch_warmup = min(warmup, 2)
+            for i in range(batch_warmup + max(iterations // batch_size, 5)):
+                start = time.perf_counter()
+                model(inputs)
+                if i >= batch_warmup:
+                    timings.append((time.perf_counter() - start) * 1000.0)
+        results[f'batch_{batch_size}'] = dict(_percentiles(timings), frames_per_sec=batch_size * 1000.0 / float(np.mean(timings)))
+    return results
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'torch': torch.__version__,
+        'opencv': cv2.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'torch_threads': torch.get_num_threads(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+def run_benchmarks(work_dir, sections=('extraction', 'dataloader', 'training', 'inference'), quick=False, worker_counts=(0, 2, 4)):
+    """
+    Run the selected benchmark sections on a synthetic corpus generated under `work_dir`.
+
+    Returns:
+        dict: {'environment': ..., 'config': ..., 'results': {section: metrics}}
+    """
+    config = {
+        'videos_per_class': 2 if quick else 4,
+        'frames_per_video': 45 if quick else 90,
+        'frame_interval': 5,
+        'worker_counts': list(worker_counts),
+        'train_steps': 5 if quick else 20,
+        'inference_iterations': 30 if quick else 100,
+    }
+    video_dir = os.path.join(work_dir, 'videos')
+    frames_dir = os.path.join(work_dir, 'frames')
+    results = {}
+
+    if ('extraction' in sections or 'dataloader' in sections) and not os.path.isdir(video_dir):
+        make_synthetic_corpus(video_dir, videos_per_class=config['videos_per_class'], frames_per_video=config['frames_per_video'])
+    if 'extraction' in sections or ('dataloader' in sections and not os.path.isdir(frames_dir)):
+        results['extraction'] = bench_extraction(video_dir, frames_dir, config['frame_interval'])
+        print(f"extraction: {results['extraction']['decoded_fps']:.0f} decoded frames/s, {results['extraction']['saved_fps']:.0f} saved frames/s")
+    if 'dataloader' in sections:
+        results['dataloader'] = bench_dataloader(frames_dir, worker_counts)
+        for name, row in results['dataloader'].items():
+            print(f"dataloader {name}: {row['samples_per_sec']:.0f} samples/s")
+    if 'training' in sections:
+        results['training'] = bench_training(steps=config['train_steps'])
+        print(f"training: {results['training']['steps_per_sec']:.2f} steps/s")
+    if 'inference' in sections:
+        results['inference'] = bench_inference(iterations=config['inference_iterations'])
+        for name, row in results['inference'].items():
+            print(f"inference {name}: p50 {row['p50_ms']:.2f} ms  p99 {row['p99_ms']:.2f} ms  {row['frames_per_sec']:.0f} frames/s")
+
+    return {'environment': environment(), 'config': config, 'results': results}
+
+def flatten_metrics(results, prefix=''):
+    """{'a': {'b_ms': 1}} -> {'a.b_ms': 1}"""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten_metrics(value, name + '.'))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+def higher_is_better(metric):
+    """True/False for throughput/latency metrics, None for counts that are not compared."""
+    for suffix, higher in METRIC_DIRECTIONS:
+        if metric.endswith(suffix):
+            return higher
+    return None
+
+def compare(baseline, current, tolerance=0.1):
+    """
+    Compare two `run_benchmarks` outputs metric by metric.
+
+    A metric regresses when it is worse than the baseline by more than `tolerance`
+    (relative), e.g. 0.1 flags throughput drops and latency increases above 10%.
+
+    Returns:
+        list: (metric, baseline value, current value, relative change, status) rows.
+    """
+    base = flatten_metrics(baseline['results'])
+    new = flatten_metrics(current['results'])
+    rows = []
+    for metric in sorted(set(base) & set(new)):
+        higher = higher_is_better(metric)
+        if higher is None or base[metric] == 0:
+            continue
+        change = (new[metric] - base[metric]) / abs(base[metric])
+        worse = -change if higher else change
+        status = 'REGRESSION' if worse > tolerance else ('improved' if worse < -tolerance else 'ok')
+        rows.append((metric, base[metric], new[metric], change, status))
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end benchmarks: extraction, data loading, training and inference.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmarks and save the results as JSON")
+    run_parser.add_argument("--output", default="benchmark_results.json")
+    run_parser.add_argument("--work-dir", help="Where to generate the synthetic corpus (default: a temporary directory); reused if it exists")
+    run_parser.add_argument("--sections", nargs="+", default=["extraction", "dataloader", "training", "inference"],
+                            choices=["extraction", "dataloader", "training", "inference"])
+    run_parser.add_argument("--workers", type=int, nargs="+", default=[0, 2, 4], help="DataLoader num_workers values to measure")
+    run_parser.add_argument("--quick", action="store_true", help="Smaller corpus and fewer iterations")
+
+    compare_parser = subparsers.add_parser("compare", help="Flag regressions between two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--tolerance", type=float, default=0.1, help="Relative slowdown that counts as a regression")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        with contextlib.ExitStack() as stack:
+            work_dir = args.work_dir or stack.enter_context(tempfile.TemporaryDirectory())
+            report = run_benchmarks(work_dir, args.sections, args.quick, args.workers)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        rows = compare(baseline, current, args.tolerance)
+        for metric, old, new, change, status in rows:
+            print(f"{metric:<45} {old:12.3f} -> {new:12.3f} {change:+8.1%}  {status}")
+        regressions = [row for row in rows if row[-1] == 'REGRESSION']
+        print(f"{len(regressions)} regression(s) over {len(rows)} metrics (tolerance {args.tolerance:.0%})")
+        sys.exit(1 if regressions else 0)
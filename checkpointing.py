@@ -0,0 +1,144 @@
+import os
+import re
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import torch
+import torch.distributed as dist
+from distributed import is_distributed, get_rank, get_world_size
+
+CHECKPOINT_PATTERN = re.compile(r'^checkpoint_epoch(\d+)\.pt$')
+
+def snapshot(obj):
+    """Deep copy of a (nested) state dict with every tensor cloned to the CPU, safe to write from another thread."""
+    if isinstance(obj, torch.Tensor):
+        return obj.detach().to('cpu', copy=True)
+    if isinstance(obj, dict):
+        return {k: snapshot(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(snapshot(v) for v in obj)
+    return obj
+
+def capture_rng_state():
+    state = {
+        'torch': torch.get_rng_state(),
+        'numpy': np.random.get_state(),
+        'python': random.getstate(),
+    }
+    if torch.cuda.is_available():
+        state['cuda'] = torch.cuda.get_rng_state_all()
+    return state
+
+def restore_rng_state(state):
+    torch.set_rng_state(state['torch'])
+    np.random.set_state(state['numpy'])
+    random.setstate(state['python'])
+    if 'cuda' in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state['cuda'])
+
+def capture_rank_states(batch_transform=None):
+    """
+    RNG and augmentation state of every rank, indexed by rank. In a distributed run this
+    is a collective: all ranks must call it, even if only rank 0 writes the checkpoint.
+    """
+    state = {
+        'rng': capture_rng_state(),
+        'batch_transform': batch_transform.state_dict() if hasattr(batch_transform, 'state_dict') else None,
+    }
+    if not is_distributed():
+        return [state]
+    states = [None] * get_world_size()
+    dist.all_gather_object(states, state)
+    return states
+
+def rank_state(training_state):
+    """
+    This rank's RNG and augmentation state from a training-state checkpoint, or None if it
+    holds none for this rank (older checkpoints only store rank 0's, and a run resumed with
+    more ranks has no state for the new ones); the rank then keeps its own seeding.
+    """
+    states = training_state.get('rank_states')
+    if states is not None and get_world_size() == len(states):
+        return states[get_rank()]
+    if get_rank() == 0:
+        return {'rng': training_state['rng'], 'batch_transform': training_state.get('batch_transform')}
+    return None
+
+def atomic_save(obj, path):
+    # Write next to the target and rename, so a crash mid-write never leaves a truncated checkpoint
+    tmp_path = path + '.tmp'
+    torch.save(obj, tmp_path)
+    with open(tmp_path, 'rb') as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class CheckpointManager:
+    """
+    Writes checkpoints on a background thread so training does not stall on disk I/O.
+
+    Callers hand over a `snapshot` (CPU copies taken on the training thread) and carry on.
+    At most one write runs at a time; a new request waits for the previous one, which
+    bounds memory to two snapshots. Training-state checkpoints go to
+    `directory/checkpoint_epochNNNN.pt` and only the newest `keep_last` are kept.
+    Errors from the writer are raised on the next call.
+    """
+    def __init__(self, directory, keep_last=3):
+        if keep_last < 1:
+            raise ValueError(f"keep_last must be at least 1, got {keep_last}")
+        self.directory = directory
+        self.keep_last = keep_last
+        os.makedirs(directory, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='checkpoint-writer')
+        self._pending = None
+        self._lock = threading.Lock()
+
+    def _submit(self, fn, *args):
+        with self._lock:
+            self.wait()
+            self._pending = self._executor.submit(fn, *args)
+
+    def wait(self):
+        """Block until the last write has finished, re-raising its error if it failed."""
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            pending.result()
+
+    def write(self, path, state):
+        """Asynchronously write an already snapshotted `state` to `path`."""
+        self._submit(atomic_save, state, path)
+
+    def save(self, epoch, state):
+        """Asynchronously write a full training-state snapshot for `epoch`, then rotate old ones."""
+        path = os.path.join(self.directory, f'checkpoint_epoch{epoch:04d}.pt')
+        self._submit(self._save_and_rotate, state, path)
+
+    def _save_and_rotate(self, state, path):
+        atomic_save(state, path)
+        for old in self.list_checkpoints(self.directory)[:-self.keep_last]:
+            os.remove(old)
+
+    @staticmethod
+    def list_checkpoints(directory):
+        """Training-state checkpoints in `directory`, oldest first."""
+        if not os.path.isdir(directory):
+            return []
+        found = []
+        for name in os.listdir(directory):
+            match = CHECKPOINT_PATTERN.match(name)
+            if match:
+                found.append((int(match.group(1)), os.path.join(directory, name)))
+        return [path for _, path in sorted(found)]
+
+    @classmethod
+    def latest(cls, directory):
+        checkpoints = cls.list_checkpoints(directory)
+        return checkpoints[-1] if checkpoints else None
+
+    def close(self):
+        self.wait()
+        self._executor.shutdown(wait=True)
+
+def load_training_state(path, map_location='cpu'):
+    # The state holds numpy/python RNG states, so it is not loadable with weights_only
+    return torch.load(path, map_location=map_location, weights_only=False)
@@ -1,22 +1,153 @@
 import cv2
 import os
+import json
+from collections import deque, namedtuple, defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from PIL import Image
 import numpy as np
 from sklearn.model_selection import train_test_split
 import shutil  
 
-def extract_frames(video_path, output_folder, frame_interval=30):
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+MANIFEST_NAME = '.extract_manifest.json'
+
+# Frames written for one video, and frames dropped as near-duplicates
+ExtractResult = namedtuple('ExtractResult', ['frames', 'dropped'])
+
+def iter_frames(video_path, frame_interval=30, seek=False):
+    """
+    Yield `(frame_index, frame)` for every `frame_interval`-th frame of a video, as BGR ndarrays.
+
+    Frames that are not kept are only grabbed (demuxed and decoded into the capture's
+    internal buffer) and never retrieved, which skips the colour conversion and the copy
+    into a numpy array. With `seek=True` the capture jumps straight to the next kept
+    frame instead; this is faster for large intervals but relies on the container
+    supporting accurate seeking.
+    """
     cap = cv2.VideoCapture(video_path)
     count = 0
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        if count % frame_interval == 0:
-            frame_path = os.path.join(output_folder, f'frame_{count}.jpg')
-            cv2.imwrite(frame_path, frame)
-        count += 1
-    cap.release()
+    try:
+        while True:
+            if seek and count > 0:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, count)
+            if not cap.grab():
+                break
+            if count % frame_interval == 0:
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                yield count, frame
+            count += frame_interval if seek else 1
+    finally:
+        cap.release()
+
+class Resize:
+    """Resize a frame to `size` (width, height), using area interpolation when shrinking."""
+    def __init__(self, size=(256, 256)):
+        self.size = tuple(size)
+
+    def __call__(self, frame):
+        h, w = frame.shape[:2]
+        if (w, h) == self.size:
+            return frame
+        shrinking = w >= self.size[0] and h >= self.size[1]
+        interpolation = cv2.INTER_AREA if shrinking else cv2.INTER_CUBIC
+        return cv2.resize(frame, self.size, interpolation=interpolation)
+
+class ConvertColor:
+    """Apply a `cv2.cvtColor` conversion code, e.g. `cv2.COLOR_BGR2GRAY`."""
+    def __init__(self, code):
+        self.code = code
+
+    def __call__(self, frame):
+        return cv2.cvtColor(frame, self.code)
+
+class Normalize:
+    """Stretch each frame's intensities to the full 0-255 range (per-frame min-max normalization)."""
+    def __call__(self, frame):
+        lo = frame.min()
+        hi = frame.max()
+        if hi == lo:
+            return frame
+        scale = np.float32(255.0 / (hi - lo))
+        return ((frame.astype(np.float32) - lo) * scale).round().astype(np.uint8)
+
+class FramePipeline:
+    """Compose frame transforms; each one takes and returns an HxWxC uint8 ndarray."""
+    def __init__(self, *transforms):
+        self.transforms = list(transforms)
+
+    def __call__(self, frame):
+        for t in self.transforms:
+            frame = t(frame)
+        return frame
+
+def default_frame_pipeline(size=(256, 256)):
+    # The old normalize_image pass divided by 255 and multiplied straight back, so only the resize matters
+    return FramePipeline(Resize(size))
+
+def dhash(frame, hash_size=8):
+    """
+    Difference hash of a frame: shrink to (hash_size+1) x hash_size grayscale and record
+    whether each pixel is brighter than its right neighbour. Near-identical frames get
+    hashes a few bits apart, regardless of resolution and small exposure changes.
+    """
+    gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    return int.from_bytes(np.packbits(small[:, 1:] > small[:, :-1]).tobytes(), 'big')
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+class FrameDeduplicator:
+    """
+    Drops frames whose dHash is within `threshold` bits of one of the last `history`
+    kept frames of the same video, e.g. while the signer holds a pose. Call `reset()`
+    between videos; `kept` and `dropped` count the decisions since then.
+    """
+    def __init__(self, threshold=5, history=8, hash_size=8):
+        self.threshold = threshold
+        self.history = history
+        self.hash_size = hash_size
+        self.reset()
+
+    def reset(self):
+        self._recent = deque(maxlen=self.history)
+        self.kept = 0
+        self.dropped = 0
+
+    def __call__(self, frame):
+        """Return True if `frame` should be kept."""
+        h = dhash(frame, self.hash_size)
+        if any(hamming_distance(h, r) <= self.threshold for r in self._recent):
+            self.dropped += 1
+            return False
+        self._recent.append(h)
+        self.kept += 1
+        return True
+
+def extract_frames(video_path, output_folder, frame_interval=30, seek=False, pipeline=None, jpeg_quality=95, dedup=None):
+    """
+    Save every `frame_interval`-th frame of a video as a JPEG and return how many were written.
+
+    Each decoded frame is passed through `pipeline` in memory and encoded exactly once,
+    so there is no need to reopen the JPEGs afterwards to resize or normalize them.
+    With a `FrameDeduplicator` as `dedup`, near-duplicates of recently kept frames are
+    dropped before the pipeline and encoding run; its counters then describe this video.
+    """
+    params = [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality]
+    saved = 0
+    if dedup is not None:
+        dedup.reset()
+    for count, frame in iter_frames(video_path, frame_interval, seek):
+        if dedup is not None and not dedup(frame):
+            continue
+        if pipeline is not None:
+            frame = pipeline(frame)
+        frame_path = os.path.join(output_folder, f'frame_{count}.jpg')
+        cv2.imwrite(frame_path, frame, params)
+        saved += 1
+    return saved
 
 def is_image_file(file_path):
     # Check if the file has a valid image extension
@@ -47,6 +178,7 @@ def normalize_image(image_path):
         print(f"Error normalizing {image_path}: {e}")
 
 def split_dataset(dataset_dir, output_dirs, split_ratio=(0.8, 0.1, 0.1)):
+    # Copies every frame and splits at frame level; split_index.py splits by video without copying
     all_files = []
     for gesture_dir in os.listdir(dataset_dir):
         gesture_path = os.path.join(dataset_dir, gesture_dir)
@@ -62,27 +194,164 @@ def split_dataset(dataset_dir, output_dirs, split_ratio=(0.8, 0.1, 0.1)):
         for file in file_set:
             shutil.copy(file, os.path.join(output_dir, os.path.basename(file)))
 
-def process_videos_in_folder(videos_folder, output_base_folder, frame_interval=30):
-    for video_file in os.listdir(videos_folder):
-        if video_file.endswith(('.mp4', '.avi', '.mov', '.mkv')):  
+def process_video(video_path, output_folder, frame_interval=30, seek=False, pipeline=None, dedup_threshold=None, dedup_history=8):
+    """
+    Extract and transform the frames of a single video, optionally dropping near-duplicate
+    frames (see `FrameDeduplicator`). Returns an ExtractResult.
+    """
+    os.makedirs(output_folder, exist_ok=True)  # Create the subfolder if it doesn't exist
+
+    # Drop frames left over from an earlier run so a changed video is not mixed with stale frames
+    for f in os.listdir(output_folder):
+        if is_image_file(f):
+            os.remove(os.path.join(output_folder, f))
+
+    # Extract frames from the video, transform them in memory and save them in the subfolder
+    if pipeline is None:
+        pipeline = default_frame_pipeline()
+    dedup = FrameDeduplicator(dedup_threshold, dedup_history) if dedup_threshold is not None else None
+    saved = extract_frames(video_path, output_folder, frame_interval, seek=seek, pipeline=pipeline, dedup=dedup)
+    return ExtractResult(saved, dedup.dropped if dedup is not None else 0)
+
+def video_signature(video_path, frame_interval, dedup_threshold=None, dedup_history=8):
+    """Cheap change detector for a video: file size, mtime and the extraction settings."""
+    st = os.stat(video_path)
+    signature = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'frame_interval': frame_interval}
+    if dedup_threshold is not None:
+        signature['dedup'] = [dedup_threshold, dedup_history]
+    return signature
+
+def load_manifest(manifest_path):
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable manifest {manifest_path}: {e}")
+        return {}
+
+def save_manifest(manifest, manifest_path):
+    # Write to a temporary file and rename so an interrupted run never leaves a truncated manifest
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+def init_extraction_worker():
+    # Each worker decodes one video; OpenCV's own thread pool would only oversubscribe the cores
+    cv2.setNumThreads(1)
+
+def process_videos_in_folder(videos_folder, output_base_folder, frame_interval=30, num_workers=None, seek=False, manifest_path=None, pipeline=None,
+                             dedup_threshold=None, dedup_history=8):
+    """
+    Extract frames from every video in `videos_folder` into one subfolder per video.
+
+    Videos are fanned out over a process pool (`num_workers=None` uses every core,
+    `num_workers=1` runs in-process). A manifest of each video's size, mtime and frame
+    interval is kept in `output_base_folder`, so a rerun only processes videos that are
+    new or have changed since they were last extracted. `pipeline` (default: resize to
+    256x256) must be picklable so it can be shipped to the workers.
+
+    With `dedup_threshold` set, frames within that many dHash bits of one of the last
+    `dedup_history` kept frames of the same video are not written. The manifest records
+    how many were dropped; `dedup_report` summarizes them per class.
+
+    Returns:
+        dict: Number of frames kept per processed video name.
+    """
+    os.makedirs(output_base_folder, exist_ok=True)
+    if manifest_path is None:
+        manifest_path = os.path.join(output_base_folder, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+
+    jobs = {}
+    for video_file in sorted(os.listdir(videos_folder)):
+        if video_file.endswith(VIDEO_EXTENSIONS):
             video_path = os.path.join(videos_folder, video_file)
-            video_name = os.path.splitext(video_file)[0]  
+            video_name = os.path.splitext(video_file)[0]
             output_folder = os.path.join(output_base_folder, video_name)  # Create a subfolder for each video
-            os.makedirs(output_folder, exist_ok=True)  # Create the subfolder if it doesn't exist
-            
-            # Extract frames from the video and save them in the subfolder
-            extract_frames(video_path, output_folder, frame_interval)
-
-            # Process each image (resize and normalize)
-            image_files = [f for f in os.listdir(output_folder) if is_image_file(os.path.join(output_folder, f))]
-            for image_file in image_files:
-                image_path = os.path.join(output_folder, image_file)
-                resize_image(image_path)
-                normalize_image(image_path)
+            signature = video_signature(video_path, frame_interval, dedup_threshold, dedup_history)
+            entry = manifest.get(video_file)
+            if entry is not None and entry.get('signature') == signature and os.path.isdir(output_folder):
+                continue
+            jobs[video_file] = (video_path, output_folder, signature)
+
+    skipped = sum(1 for f in os.listdir(videos_folder) if f.endswith(VIDEO_EXTENSIONS)) - len(jobs)
+    print(f"{len(jobs)} videos to process, {skipped} unchanged")
+
+    results = {}
+
+    def record(video_file, signature, result):
+        manifest[video_file] = {'signature': signature, 'frames': result.frames, 'dropped': result.dropped}
+        save_manifest(manifest, manifest_path)
+        results[os.path.splitext(video_file)[0]] = result.frames
+        dropped = f", {result.dropped} near-duplicates dropped" if dedup_threshold is not None else ""
+        print(f"[{len(results)}/{len(jobs)}] {video_file}: {result.frames} frames{dropped}")
+
+    args = (frame_interval, seek, pipeline, dedup_threshold, dedup_history)
+    if num_workers == 1:
+        for video_file, (video_path, output_folder, signature) in jobs.items():
+            try:
+                result = process_video(video_path, output_folder, *args)
+            except Exception as e:
+                print(f"Error processing {video_file}: {e}")
+                continue
+            record(video_file, signature, result)
+        return results
+
+    with ProcessPoolExecutor(max_workers=num_workers, initializer=init_extraction_worker) as executor:
+        futures = {
+            executor.submit(process_video, video_path, output_folder, *args): (video_file, signature)
+            for video_file, (video_path, output_folder, signature) in jobs.items()
+        }
+        for future in as_completed(futures):
+            video_file, signature = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Error processing {video_file}: {e}")
+                continue
+            record(video_file, signature, result)
+    return results
+
+def dedup_report(processed_dir, report_path=None):
+    """
+    Frames kept and dropped as near-duplicates per class, from the extraction manifests.
+
+    Reads the manifest in `processed_dir` itself (one folder per video, so each video is a
+    class, as GestureDataset sees it) and those of its subfolders (one folder per class).
+
+    Returns:
+        dict: Per class: videos, frames kept, frames dropped and the fraction removed.
+    """
+    totals = defaultdict(lambda: {'videos': 0, 'kept': 0, 'dropped': 0})
+    manifests = [(None, os.path.join(processed_dir, MANIFEST_NAME))]
+    manifests += [(d.name, os.path.join(d.path, MANIFEST_NAME)) for d in os.scandir(processed_dir) if d.is_dir()]
+    for class_name, manifest_path in manifests:
+        for video_file, entry in load_manifest(manifest_path).items():
+            row = totals[class_name or os.path.splitext(video_file)[0]]
+            row['videos'] += 1
+            row['kept'] += entry.get('frames', 0)
+            row['dropped'] += entry.get('dropped', 0)
+
+    report = {}
+    for class_name in sorted(totals):
+        row = totals[class_name]
+        row['removed_fraction'] = row['dropped'] / max(row['kept'] + row['dropped'], 1)
+        report[class_name] = row
+    if report_path is not None:
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+    return report
 
 if __name__ == "__main__":
     videos_folder = "downloads"  # Folder containing multiple video files
     output_base_folder = "processed_videos"  # Folder where all frames will be stored
     frame_interval = 10  # Set the interval for frame extraction
-    
-    process_videos_in_folder(videos_folder, output_base_folder, frame_interval)
+    dedup_threshold = None  # e.g. 5: skip frames within 5 dHash bits of a recently kept frame of the same video
+
+    process_videos_in_folder(videos_folder, output_base_folder, frame_interval, dedup_threshold=dedup_threshold)
+    if dedup_threshold is not None:
+        for class_name, row in dedup_report(output_base_folder, os.path.join(output_base_folder, 'dedup_report.json')).items():
+            print(f"{class_name}: kept {row['kept']}, dropped {row['dropped']} ({row['removed_fraction']:.1%})")
@@ -0,0 +1,124 @@
+import os
+import socket
+import contextlib
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from torch.utils.data import Sampler
+
+def init_distributed(backend='gloo'):
+    """
+    Join the process group described by the torchrun environment (RANK, WORLD_SIZE, MASTER_ADDR, MASTER_PORT).
+
+    Does nothing when WORLD_SIZE is unset or 1, so single-process runs need no changes.
+
+    Returns:
+        tuple: (rank, world_size)
+    """
+    world_size = int(os.environ.get('WORLD_SIZE', 1))
+    if world_size <= 1:
+        return 0, 1
+    if not dist.is_initialized():
+        dist.init_process_group(backend=backend)
+    # Split the cores between the ranks instead of every rank starting one thread per core
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // world_size))
+    return dist.get_rank(), world_size
+
+def is_distributed():
+    return dist.is_available() and dist.is_initialized()
+
+def get_rank():
+    return dist.get_rank() if is_distributed() else 0
+
+def get_world_size():
+    return dist.get_world_size() if is_distributed() else 1
+
+def is_main_process():
+    return get_rank() == 0
+
+def barrier():
+    if is_distributed():
+        dist.barrier()
+
+@contextlib.contextmanager
+def main_process_first():
+    """
+    Run the block on rank 0 first and on the other ranks once it is done, e.g. to build
+    an index file that the other ranks then only read.
+    """
+    if not is_main_process():
+        barrier()
+    try:
+        yield
+    finally:
+        if is_main_process():
+            barrier()
+
+def cleanup():
+    if is_distributed():
+        dist.destroy_process_group()
+
+def unwrap_model(model):
+    """The plain model inside a DistributedDataParallel (or torch.compile) wrapper."""
+    while True:
+        if isinstance(model, torch.nn.parallel.DistributedDataParallel):
+            model = model.module
+        elif hasattr(model, '_orig_mod'):
+            model = model._orig_mod
+        else:
+            return model
+
+def reduce_metrics(loss_sum, corrects, count):
+    """
+    Sum loss, correct predictions and sample counts over all ranks.
+
+    Raises:
+        ValueError: If no rank saw any sample; an empty split has no meaningful loss.
+
+    Returns:
+        tuple: (mean loss, accuracy) over every sample seen by any rank.
+    """
+    stats = torch.stack([loss_sum.detach().double().cpu(), corrects.detach().double().cpu(), torch.tensor(float(count), dtype=torch.float64)])
+    if is_distributed():
+        dist.all_reduce(stats)
+    loss_sum, corrects, count = stats.tolist()
+    # Checked after the reduction, so every rank raises together
+    if count == 0:
+        raise ValueError("No samples to compute metrics over: the data loader is empty")
+    return loss_sum / count, corrects / count
+
+class ShardSampler(Sampler):
+    """
+    Deterministic, unpadded split of a dataset across ranks, for evaluation.
+
+    Unlike DistributedSampler it never repeats samples to even out the shards, so
+    metrics summed over ranks cover every sample exactly once.
+    """
+    def __init__(self, dataset, rank=None, world_size=None):
+        self.dataset = dataset
+        self.rank = get_rank() if rank is None else rank
+        self.world_size = get_world_size() if world_size is None else world_size
+
+    def __iter__(self):
+        return iter(range(self.rank, len(self.dataset), self.world_size))
+
+    def __len__(self):
+        return len(range(self.rank, len(self.dataset), self.world_size))
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def _local_worker(rank, world_size, port, fn, args):
+    os.environ.update({'RANK': str(rank), 'WORLD_SIZE': str(world_size), 'LOCAL_RANK': str(rank),
+                       'MASTER_ADDR': '127.0.0.1', 'MASTER_PORT': str(port)})
+    init_distributed()
+    try:
+        fn(rank, world_size, *args)
+    finally:
+        cleanup()
+
+def launch_local(fn, world_size, *args):
+    """Run `fn(rank, world_size, *args)` in `world_size` processes joined over localhost (like torchrun on one node)."""
+    mp.spawn(_local_worker, args=(world_size, _free_port(), fn, args), nprocs=world_size, join=True)
@@ -1,6 +1,17 @@
-import requests
 import os
+import re
+import json
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import urlparse, parse_qs
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_BASE_URL = "https://drive.google.com/uc"
+CHUNK_SIZE = 1 << 16
 
 def get_file_id_from_url(url):
     """Extract file ID from Google Drive shareable URL."""
@@ -10,34 +21,189 @@ def get_file_id_from_url(url):
         return file_id[0]
     return None
 
-def download_file_from_google_drive(url, dest_folder):
-    """Download file from Google Drive."""
+def make_session(pool_size=8, retries=5):
+    """Shared session with a connection pool per host and retries with backoff on transient errors."""
+    session = requests.Session()
+    retry = Retry(total=retries, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=frozenset(['GET', 'HEAD']))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+class DownloadManifest:
+    """Thread-safe JSON record of completed downloads: file id -> file name, size and sha256."""
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+
+    def completed_path(self, file_id, dest_folder):
+        """
+        Local path of `file_id` if it was downloaded before and is still intact on disk, else None.
+        Files of the recorded size are re-hashed, so a corrupted copy is fetched again.
+        """
+        entry = self.entries.get(file_id)
+        if entry is None:
+            return None
+        file_path = os.path.join(dest_folder, entry['file_name'])
+        if not os.path.exists(file_path) or os.path.getsize(file_path) != entry['size']:
+            return None
+        digest = hashlib.sha256()
+        _hash_file(file_path, digest)
+        if digest.hexdigest() != entry['sha256']:
+            print(f"Checksum mismatch, downloading again: {file_path}")
+            return None
+        return file_path
+
+    def record(self, file_id, file_name, size, sha256):
+        with self._lock:
+            self.entries[file_id] = {'file_name': file_name, 'size': size, 'sha256': sha256}
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self.entries, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+def _hash_file(path, digest):
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+
+def _range_start(content_range):
+    """First byte position of a `Content-Range: bytes start-end/total` header, or None."""
+    match = re.match(r'bytes\s+(\d+)-', content_range or '')
+    return int(match.group(1)) if match else None
+
+def download_file_from_google_drive(url, dest_folder, session=None, base_url=DEFAULT_BASE_URL, manifest=None, timeout=60):
+    """
+    Download one file from Google Drive (or a stand-in server at `base_url`).
+
+    Data is streamed into `<file id>.part` and renamed once complete, so an interrupted
+    download resumes with an HTTP Range request on the next run. Files already recorded
+    in `manifest` with a matching size and sha256 on disk are skipped.
+
+    Returns:
+        str: Local path of the downloaded file, or None if it failed.
+    """
     file_id = get_file_id_from_url(url)
     if not file_id:
         print(f"Invalid URL: {url}")
-        return
-    
-    # Request the file
-    request_url = f"https://drive.google.com/uc?id={file_id}&export=download"
-    response = requests.get(request_url, stream=True)
-    if response.status_code == 200:
-        # Get the file name
-        file_name = response.headers.get('Content-Disposition')
-        if file_name:
-            file_name = file_name.split('filename=')[1].strip('"')
-        else:
-            file_name = file_id + ".tmp"
-        
-        # Save file
-        if not os.path.exists(dest_folder):
-            os.makedirs(dest_folder)
-        file_path = os.path.join(dest_folder, file_name)
-        with open(file_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-        print(f"Downloaded: {file_path}")
-    else:
-        print(f"Failed to download: {url}")
+        return None
+
+    if manifest is not None:
+        file_path = manifest.completed_path(file_id, dest_folder)
+        if file_path is not None:
+            print(f"Already downloaded: {file_path}")
+            return file_path
+
+    session = session or requests
+    os.makedirs(dest_folder, exist_ok=True)
+    part_path = os.path.join(dest_folder, file_id + ".part")
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+
+    # Request the file, asking only for the missing tail if part of it is already on disk
+    request_url = f"{base_url}?id={file_id}&export=download"
+    headers = {'Range': f'bytes={offset}-'} if offset else {}
+    digest = hashlib.sha256()
+    try:
+        with session.get(request_url, stream=True, headers=headers, timeout=timeout) as response:
+            if response.status_code == 206 and _range_start(response.headers.get('Content-Range')) != offset:
+                # The server ignored or misread the Range header: appending this body would corrupt the file
+                if offset == 0:
+                    print(f"Failed to download: {url} (unexpected Content-Range {response.headers.get('Content-Range')!r})")
+                    return None
+                response.close()
+                os.remove(part_path)
+                print(f"Server did not resume at byte {offset}, restarting from scratch: {url}")
+                return download_file_from_google_drive(url, dest_folder, session, base_url, manifest, timeout)
+            if response.status_code == 416:
+                # The partial file is no longer valid for this resource; start over next time
+                os.remove(part_path)
+                print(f"Failed to resume, discarded partial download: {url}")
+                return None
+            if response.status_code == 206:
+                mode = 'ab'
+                _hash_file(part_path, digest)
+            elif response.status_code == 200:
+                mode = 'wb'
+                offset = 0
+            else:
+                print(f"Failed to download: {url} (HTTP {response.status_code})")
+                return None
+
+            # Get the file name
+            file_name = response.headers.get('Content-Disposition')
+            if file_name and 'filename=' in file_name:
+                file_name = file_name.split('filename=')[1].strip('"')
+            else:
+                file_name = file_id + ".tmp"
+
+            # Total size: from Content-Range when resuming, Content-Length otherwise
+            content_range = response.headers.get('Content-Range', '')
+            if '/' in content_range and not content_range.endswith('*'):
+                expected_size = int(content_range.rsplit('/', 1)[1])
+            elif 'Content-Length' in response.headers:
+                expected_size = offset + int(response.headers['Content-Length'])
+            else:
+                expected_size = None
+
+            with open(part_path, mode) as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    f.write(chunk)
+                    digest.update(chunk)
+    except requests.RequestException as e:
+        print(f"Failed to download: {url} ({e}), partial data kept for resume")
+        return None
+
+    size = os.path.getsize(part_path)
+    if expected_size is not None and size != expected_size:
+        print(f"Incomplete download: {url} ({size}/{expected_size} bytes), partial data kept for resume")
+        return None
+
+    file_path = os.path.join(dest_folder, file_name)
+    os.replace(part_path, file_path)
+    if manifest is not None:
+        manifest.record(file_id, file_name, size, digest.hexdigest())
+    print(f"Downloaded: {file_path}")
+    return file_path
+
+def download_all(links, dest_folder, num_workers=8, base_url=DEFAULT_BASE_URL, manifest_path=None, on_complete=None):
+    """
+    Download `links` concurrently over one pooled session.
+
+    `on_complete(path)` is called from the worker thread as soon as each file is on disk
+    (including files skipped as already downloaded). If it blocks, that worker stops
+    downloading, which lets a slow consumer apply backpressure.
+
+    Returns:
+        dict: Local path (or None on failure) per link.
+    """
+    if manifest_path is None:
+        manifest_path = os.path.join(dest_folder, "manifest.json")
+    os.makedirs(dest_folder, exist_ok=True)
+    manifest = DownloadManifest(manifest_path)
+    session = make_session(pool_size=num_workers)
+
+    def download(link):
+        try:
+            file_path = download_file_from_google_drive(link, dest_folder, session, base_url, manifest)
+        except OSError as e:
+            # Disk full, permissions, ...: fail this file, not the whole batch
+            print(f"Failed to download: {link} ({e})")
+            return None
+        if file_path is not None and on_complete is not None:
+            on_complete(file_path)
+        return file_path
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        futures = {executor.submit(download, link): link for link in links}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+    session.close()
+    return results
 
 # List of Google Drive file links
 file_links = [
@@ -196,11 +362,17 @@ file_links = [
   "https://drive.google.com/open?id=1BQb60Nk1lo6FDFXqshNVUCRAZhhrNcQb&usp=drive_copy",
   "https://drive.google.com/open?id=1BRDlhF5uLUedrp9YgrsI1G62F2c5jK5U&usp=drive_copy"]
 
-# Create a directory to save the downloaded files
-download_dir = "downloads"
-
-# Download files
-for link in file_links:
-    download_file_from_google_drive(link, download_dir)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download the gesture video corpus.")
+    parser.add_argument("--dest", default="downloads", help="Directory to save the downloaded files")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL, help="Download endpoint, e.g. a local stand-in server for testing")
+    args = parser.parse_args()
 
-print("All files downloaded.")
+    # Download files
+    results = download_all(file_links, args.dest, num_workers=args.workers, base_url=args.base_url)
+    failed = [link for link, path in results.items() if path is None]
+    if failed:
+        print(f"{len(failed)} of {len(results)} files failed, rerun to retry them.")
+    else:
+        print("All files downloaded.")
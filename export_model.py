@@ -0,0 +1,86 @@
+import os
+import json
+import argparse
+import torch
+from simple_cnn import load_model
+
+IMAGENET_MEAN = [0.485, 0.456, 0.406]
+IMAGENET_STD = [0.229, 0.224, 0.225]
+
+def export_metadata(classes, input_size):
+    return {
+        'input_shape': [1, 3, input_size, input_size],
+        'input_layout': 'NCHW',
+        'input_format': 'RGB float32, (x / 255 - mean) / std',
+        'mean': IMAGENET_MEAN,
+        'std': IMAGENET_STD,
+        'classes': list(classes) if classes is not None else None,
+    }
+
+def export_torchscript(model, path, meta):
+    """Trace, freeze and save `model`; the metadata is embedded as extra files in the archive."""
+    example_input = torch.zeros(meta['input_shape'])
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example_input)
+    if not any(p.is_quantized for p in traced.parameters()):
+        traced = torch.jit.freeze(traced)
+    torch.jit.save(traced, path, _extra_files={
+        'classes.json': json.dumps(meta['classes']),
+        'meta.json': json.dumps(meta),
+    })
+
+def export_onnx(model, path, meta, opset=17):
+    """
+    Export to ONNX with a dynamic batch axis and the metadata stored in `metadata_props`.
+
+    Returns False (after printing why) when the exporter or the `onnx` package is missing.
+    """
+    try:
+        import onnx
+    except ImportError as e:
+        print(f"Skipping ONNX export: {e}")
+        return False
+
+    # Export next to the target and only rename once the metadata is in, so `path` never
+    # holds a model without its class names
+    example_input = torch.zeros(meta['input_shape'])
+    tmp_path = path + '.tmp'
+    try:
+        torch.onnx.export(
+            model, example_input, tmp_path,
+            input_names=['input'], output_names=['logits'],
+            dynamic_axes={'input': {0: 'batch'}, 'logits': {0: 'batch'}},
+            opset_version=opset,
+        )
+        onnx_model = onnx.load(tmp_path)
+        for key, value in meta.items():
+            entry = onnx_model.metadata_props.add()
+            entry.key = key
+            entry.value = json.dumps(value)
+        onnx.save(onnx_model, tmp_path)
+        os.replace(tmp_path, path)
+    except (ImportError, RuntimeError) as e:
+        print(f"Skipping ONNX export: {e}")
+        return False
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a checkpoint to TorchScript and ONNX for deployment.")
+    parser.add_argument("--model", default="final_model2.pth", help="Checkpoint in any format simple_cnn.load_model reads")
+    parser.add_argument("--output-prefix", default="gesture_model")
+    parser.add_argument("--input-size", type=int, default=224)
+    parser.add_argument("--classes", nargs="*", help="Class names, if the checkpoint does not record them")
+    parser.add_argument("--no-onnx", action="store_true")
+    args = parser.parse_args()
+
+    model, classes = load_model(args.model, 'cpu')
+    meta = export_metadata(args.classes or classes, args.input_size)
+
+    export_torchscript(model, args.output_prefix + '.pt', meta)
+    print(f"Exported TorchScript to {args.output_prefix}.pt")
+    if not args.no_onnx and not isinstance(model, torch.jit.ScriptModule):
+        if export_onnx(model, args.output_prefix + '.onnx', meta):
+            print(f"Exported ONNX to {args.output_prefix}.onnx")
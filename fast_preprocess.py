@@ -0,0 +1,152 @@
+import time
+import argparse
+import threading
+import cv2
+import numpy as np
+import torch
+
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+class FramePreprocessor:
+    """
+    Raw OpenCV BGR frame -> normalized 1x3xSxS float32 tensor, without PIL.
+
+    Does one `cv2.resize` into a preallocated uint8 buffer, then the BGR->RGB swap,
+    /255 and mean/std normalization as a single multiply-add per channel written
+    straight into a preallocated NCHW output.
+
+    By default the returned tensor is reused by the next call, which is right for a loop
+    that consumes each result before preprocessing the next frame. With `pooled=True`
+    each call takes a buffer from a free-list (allocating one only when all are in use)
+    and the consumer hands it back with `release` once it is done with it, so outputs
+    that are queued or in use by another thread are never overwritten.
+    """
+    def __init__(self, input_size=224, mean=IMAGENET_MEAN, std=IMAGENET_STD, pooled=False):
+        self.input_size = input_size
+        std = np.asarray(std, dtype=np.float32)
+        self._scale = 1.0 / (255.0 * std)
+        self._shift = -np.asarray(mean, dtype=np.float32) / std
+        self._resized = np.empty((input_size, input_size, 3), dtype=np.uint8)
+        self.pooled = pooled
+        self._output = self._new_buffer()
+        self._free = [self._output]
+        self._owned = {id(self._output)}
+        self._lock = threading.Lock()
+
+    def _new_buffer(self):
+        return torch.empty((1, 3, self.input_size, self.input_size), dtype=torch.float32)
+
+    def _acquire(self):
+        with self._lock:
+            if self._free:
+                return self._free.pop()
+            buffer = self._new_buffer()
+            self._owned.add(id(buffer))
+            return buffer
+
+    def release(self, tensor):
+        """Return a pooled output to the free-list; anything else (None, other tensors) is ignored."""
+        if not self.pooled or tensor is None:
+            return
+        with self._lock:
+            if id(tensor) in self._owned and all(t is not tensor for t in self._free):
+                self._free.append(tensor)
+
+    @property
+    def num_buffers(self):
+        return len(self._owned)
+
+    def __call__(self, frame, out=None):
+        """
+        Preprocess `frame`. If `out` (a 3xSxS float32 ndarray, e.g. a view into a batch
+        buffer) is given the result is written there and returned; otherwise the next
+        internal 1x3xSxS tensor is filled and returned.
+        """
+        size = self.input_size
+        h, w = frame.shape[:2]
+        # Area interpolation when shrinking is closest to PIL's antialiased resize
+        interpolation = cv2.INTER_AREA if w >= size and h >= size else cv2.INTER_LINEAR
+        cv2.resize(frame, (size, size), dst=self._resized, interpolation=interpolation)
+
+        if out is None:
+            result = self._acquire() if self.pooled else self._output
+            dst = result.numpy()[0]
+        else:
+            result = dst = out
+
+        # Output channel c (RGB) comes from input channel 2 - c (BGR)
+        for c in range(3):
+            np.multiply(self._resized[:, :, 2 - c], self._scale[c], out=dst[c])
+            dst[c] += self._shift[c]
+        return result
+
+def reference_transform(input_size=224):
+    """The torchvision/PIL preprocessing test_rt.py used before FramePreprocessor."""
+    from PIL import Image
+    from torchvision import transforms
+    transform = transforms.Compose([
+        transforms.Resize((input_size, input_size)),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=list(IMAGENET_MEAN), std=list(IMAGENET_STD))
+    ])
+    return lambda frame: transform(Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))).unsqueeze(0)
+
+def synthetic_frame(width=640, height=480, seed=0):
+    """Smooth camera-like BGR test frame: colour gradients plus a few filled shapes."""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    frame = np.stack([x / width * 255, y / height * 255, (x + y) / (width + height) * 255], axis=-1).astype(np.uint8)
+    for _ in range(5):
+        cx, cy = int(rng.integers(0, width)), int(rng.integers(0, height))
+        colour = tuple(int(v) for v in rng.integers(0, 256, size=3))
+        cv2.circle(frame, (cx, cy), int(rng.integers(20, 80)), colour, -1)
+    return cv2.GaussianBlur(frame, (5, 5), 0)
+
+def check_parity(input_size=224, frames=5, tolerance=0.05):
+    """
+    Compare FramePreprocessor against the torchvision reference on synthetic frames.
+
+    The two paths use different resamplers, so outputs match up to interpolation
+    differences; the mean absolute difference must stay below `tolerance` (in
+    normalized units, roughly 3 grey levels).
+    """
+    fast = FramePreprocessor(input_size)
+    reference = reference_transform(input_size)
+    worst_mean = worst_max = 0.0
+    for seed in range(frames):
+        frame = synthetic_frame(seed=seed)
+        expected = reference(frame)
+        actual = fast(frame)
+        assert actual.shape == expected.shape, (actual.shape, expected.shape)
+        diff = (actual - expected).abs()
+        worst_mean = max(worst_mean, diff.mean().item())
+        worst_max = max(worst_max, diff.max().item())
+    print(f"Parity: mean abs diff {worst_mean:.4f}, max abs diff {worst_max:.4f}")
+    assert worst_mean < tolerance, f"Mean abs diff {worst_mean:.4f} exceeds {tolerance}"
+    return worst_mean, worst_max
+
+def benchmark(input_size=224, iterations=500, width=640, height=480):
+    """Time the torchvision reference and FramePreprocessor per frame, in microseconds."""
+    frame = synthetic_frame(width, height)
+    results = {}
+    for name, fn in (('torchvision', reference_transform(input_size)), ('fast', FramePreprocessor(input_size))):
+        for _ in range(20):
+            fn(frame)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn(frame)
+        results[name] = (time.perf_counter() - start) / iterations * 1e6
+        print(f"{name:>12}: {results[name]:.1f} us/frame")
+    print(f"Speedup: {results['torchvision'] / results['fast']:.2f}x")
+    return results
+
+if __name__ == "__main__":
+    # The parity check runs as part of the test suite (tests/test_fast_preprocess.py)
+    parser = argparse.ArgumentParser(description="Microbenchmark for FramePreprocessor.")
+    parser.add_argument("--input-size", type=int, default=224)
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    torch.set_num_threads(1)
+    benchmark(args.input_size, args.iterations)
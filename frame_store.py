@@ -0,0 +1,114 @@
+import os
+import argparse
+import numpy as np
+from PIL import Image
+from torch.utils.data import Dataset
+from gesture_dataset import GestureDataset, _frame_number
+
+def pack_frames(data_dir, output_prefix, size=(256, 256)):
+    """
+    Pack every image under `data_dir` into one contiguous uint8 array file.
+
+    Writes `<output_prefix>.npy` with shape (N, H, W, 3) in RGB order and a
+    `<output_prefix>.index.npz` sidecar with the labels, class names, source videos and source paths.
+    Images that are not already `size` (width, height) are resized while packing.
+
+    Returns:
+        int: Number of packed frames.
+
+    Raises:
+        ValueError: If `data_dir` holds no images.
+    """
+    dataset = GestureDataset(data_dir)
+    n = len(dataset)
+    if n == 0:
+        raise ValueError(f"No images found under {data_dir}, nothing to pack")
+    width, height = size
+
+    # Write under temporary names and rename at the end so a half-written store is never picked up
+    tmp_frames = output_prefix + '.tmp.npy'
+    tmp_index = output_prefix + '.index.tmp.npz'
+    frames = np.lib.format.open_memmap(tmp_frames, mode='w+', dtype=np.uint8, shape=(n, height, width, 3))
+    for i, image_path in enumerate(dataset.image_paths):
+        with Image.open(image_path) as img:
+            img = img.convert("RGB")
+            if img.size != (width, height):
+                img = img.resize((width, height))
+            frames[i] = np.asarray(img)
+    frames.flush()
+    del frames
+
+    np.savez(
+        tmp_index,
+        labels=np.asarray(dataset.labels, dtype=np.int64),
+        classes=np.asarray(dataset.classes, dtype=str),
+        paths=np.asarray([os.path.relpath(p, data_dir) for p in dataset.image_paths], dtype=str),
+        groups=np.asarray(dataset.groups, dtype=str),
+    )
+    os.replace(tmp_frames, output_prefix + '.npy')
+    os.replace(tmp_index, output_prefix + '.index.npz')
+    return n
+
+class PackedGestureDataset(Dataset):
+    """
+    GestureDataset backed by a store written by `pack_frames`.
+
+    The frame array is memory-mapped, so pages are shared between DataLoader workers
+    through the OS page cache; `__getitem__` returns a private, writable HxWx3 uint8 copy
+    of the frame (the mapped view itself is read-only, which torch warns about when
+    collating it). Set `to_pil=True` to get PIL images for the torchvision transforms
+    used with `GestureDataset`.
+    """
+    def __init__(self, output_prefix, transform=None, to_pil=False):
+        self.output_prefix = output_prefix
+        self.transform = transform
+        self.to_pil = to_pil
+        with np.load(output_prefix + '.index.npz') as index:
+            self.labels = index['labels']
+            self.classes = index['classes'].tolist()
+            self.paths = index['paths']
+            self.groups = index['groups'].tolist()
+        self._frames = None
+
+    @property
+    def frame_numbers(self):
+        return [_frame_number(p) for p in self.paths]
+
+    def __getstate__(self):
+        # Each worker maps the file itself instead of receiving a pickled copy of the array
+        state = self.__dict__.copy()
+        state['_frames'] = None
+        return state
+
+    @property
+    def frames(self):
+        if self._frames is None:
+            self._frames = np.load(self.output_prefix + '.npy', mmap_mode='r')
+        return self._frames
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, idx):
+        image = np.array(self.frames[idx])
+        label = int(self.labels[idx])
+
+        if self.to_pil:
+            image = Image.fromarray(image)
+        if self.transform:
+            image = self.transform(image)
+
+        return image, label
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pack a processed_videos tree into a memory-mappable frame store.")
+    parser.add_argument("--data-dir", default="processed_videos")
+    parser.add_argument("--output-prefix", default="processed_videos_packed")
+    parser.add_argument("--size", type=int, nargs=2, default=(256, 256), metavar=("WIDTH", "HEIGHT"))
+    args = parser.parse_args()
+
+    try:
+        count = pack_frames(args.data_dir, args.output_prefix, tuple(args.size))
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"Packed {count} frames into {args.output_prefix}.npy")
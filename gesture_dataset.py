@@ -1,32 +1,232 @@
 
 import os
+import re
+import json
+import zipfile
+import numpy as np
+import torch
 from PIL import Image
 from torch.utils.data import Dataset
+from sample_cache import SharedImageCache
+
+INDEX_NAME = '.gesture_index.npz'
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif')
+
+def _scan_dir(path, cached):
+    """
+    Image file names and subfolder names of `path`, reusing `cached` while the folder's mtime is unchanged.
+
+    Returns:
+        tuple: (entry, changed) where entry is [mtime_ns, files, subdirs].
+    """
+    mtime = os.stat(path).st_mtime_ns
+    if cached is not None and cached[0] == mtime:
+        return cached, False
+    files = []
+    subdirs = []
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_dir():
+                subdirs.append(entry.name)
+            elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                files.append(entry.name)
+    return [mtime, sorted(files), sorted(subdirs)], True
 
 class GestureDataset(Dataset):
-    def __init__(self, data_dir, transform=None):
+    def __init__(self, data_dir, transform=None, cache_bytes=0, cache_size=(256, 256), index_path=None, cache_mp_context=None):
+        """
+        Parameters:
+            data_dir (str): Folder with one subfolder per class, holding either the images
+                directly or one subfolder of frames per source video.
+            transform (callable): Transform applied to each PIL image.
+            cache_bytes (int): Budget for a shared-memory LRU cache of decoded images; 0 disables it.
+            cache_size (tuple): (width, height) that images are resized to before they are cached.
+            index_path (str): Where to cache the directory index (default: `data_dir/.gesture_index.npz`).
+                Folders whose mtime is unchanged are not listed again, so startup stays fast
+                as the corpus grows. Pass False to always rescan.
+            cache_mp_context (str): Start method of the DataLoader workers that share the cache
+                ('fork', 'spawn', 'forkserver'); must match the DataLoader's `multiprocessing_context`.
+        """
         self.data_dir = data_dir
         self.transform = transform
-        self.classes = sorted(os.listdir(data_dir))  # Get the class names
-        self.image_paths = []
-        self.labels = []
+        if index_path is None:
+            index_path = os.path.join(data_dir, INDEX_NAME)
+        self._build_index(index_path)
+
+        # Decoded images are cached before the random transforms, so augmentation still varies per epoch
+        self.cache_size = tuple(cache_size)
+        self.cache = None
+        if cache_bytes > 0 and len(self):
+            width, height = self.cache_size
+            self.cache = SharedImageCache(len(self), (height, width, 3), cache_bytes, mp_context=cache_mp_context)
+
+    def _build_index(self, index_path):
+        cached_dirs = {}
+        if index_path and os.path.exists(index_path):
+            try:
+                with np.load(index_path) as index:
+                    cached_dirs = json.loads(str(index['dirs']))
+            except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile) as e:
+                print(f"Ignoring unreadable dataset index {index_path}: {e}")
+
+        # The root listing is cheap and always redone: the index file itself lives there and bumps its mtime
+        self.classes = sorted(d.name for d in os.scandir(self.data_dir) if d.is_dir() and not d.name.startswith('.'))
+        dirs = {}
+        changed = False
+        paths = []
+        labels = []
+        group_ids = []
+        self.group_names = []
 
         for idx, gesture in enumerate(self.classes):
-            gesture_folder = os.path.join(data_dir, gesture)
-            for image_name in os.listdir(gesture_folder):
-                image_path = os.path.join(gesture_folder, image_name)
-                self.image_paths.append(image_path)
-                self.labels.append(idx)
+            dirs[gesture], dir_changed = _scan_dir(os.path.join(self.data_dir, gesture), cached_dirs.get(gesture))
+            changed |= dir_changed
+            _, files, subdirs = dirs[gesture]
+
+            # Images directly inside a class folder are treated as frames of a single video
+            if files:
+                group_ids.extend([len(self.group_names)] * len(files))
+                self.group_names.append(gesture)
+                paths.extend(f"{gesture}/{f}" for f in files)
+                labels.extend([idx] * len(files))
+
+            for video in subdirs:
+                rel = f"{gesture}/{video}"
+                dirs[rel], dir_changed = _scan_dir(os.path.join(self.data_dir, gesture, video), cached_dirs.get(rel))
+                changed |= dir_changed
+                video_files = dirs[rel][1]
+                group_ids.extend([len(self.group_names)] * len(video_files))
+                self.group_names.append(rel)
+                paths.extend(f"{rel}/{f}" for f in video_files)
+                labels.extend([idx] * len(video_files))
+
+        changed |= set(dirs) != set(cached_dirs)
+
+        # Relative paths live in one bytes blob addressed by offsets: cheap to pickle into DataLoader workers
+        encoded = [p.encode('utf-8') for p in paths]
+        self._path_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(p) for p in encoded], out=self._path_offsets[1:])
+        self._path_blob = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        self.labels = np.asarray(labels, dtype=np.int32)
+        self._group_ids = np.asarray(group_ids, dtype=np.int32)
+
+        if index_path and changed:
+            try:
+                tmp_path = f'{index_path}.{os.getpid()}.tmp.npz'
+                np.savez(tmp_path, dirs=np.array(json.dumps(dirs)))
+                os.replace(tmp_path, index_path)
+            except OSError as e:
+                print(f"Could not write dataset index {index_path}: {e}")
+
+    def image_path(self, idx):
+        rel = self._path_blob[self._path_offsets[idx]:self._path_offsets[idx + 1]].tobytes().decode('utf-8')
+        return os.path.join(self.data_dir, rel)
+
+    @property
+    def image_paths(self):
+        return [self.image_path(i) for i in range(len(self))]
+
+    @property
+    def groups(self):
+        # Source video of each sample ("class/video"), used to split without leaking videos across sets
+        return [self.group_names[i] for i in self._group_ids]
+
+    @property
+    def frame_numbers(self):
+        # Position of each frame in its source video, from the frame_<n> file names
+        return [_frame_number(self.image_path(i)) for i in range(len(self))]
+
+    @property
+    def group_ids(self):
+        # Index into `group_names` for each sample
+        return self._group_ids
 
     def __len__(self):
-        return len(self.image_paths)
+        return len(self.labels)
+
+    def _load_image(self, idx):
+        if self.cache is None:
+            return Image.open(self.image_path(idx)).convert("RGB")
+
+        pixels = self.cache.get(idx)
+        if pixels is None:
+            with Image.open(self.image_path(idx)) as img:
+                img = img.convert("RGB")
+                if img.size != self.cache_size:
+                    img = img.resize(self.cache_size)
+                pixels = np.asarray(img)
+            self.cache.put(idx, pixels)
+        return Image.fromarray(pixels)
 
     def __getitem__(self, idx):
-        image_path = self.image_paths[idx]
-        image = Image.open(image_path).convert("RGB")
-        label = self.labels[idx]
+        image = self._load_image(idx)
+        label = int(self.labels[idx])
 
         if self.transform:
             image = self.transform(image)
 
         return image, label
+
+def _frame_number(path):
+    # extract_frames names frames frame_<n>.jpg, which sort wrongly as strings (frame_10 < frame_2)
+    numbers = re.findall(r'\d+', os.path.basename(path))
+    return int(numbers[-1]) if numbers else -1
+
+class ClipDataset(Dataset):
+    """
+    Fixed-length clips of consecutive frames, cut from each video folder of a GestureDataset.
+
+    Frames are ordered by their frame number and clips start every `stride` frames; a
+    video shorter than `window` yields one clip padded by repeating its last frame. Each
+    item is a (window, ...) stack of the frame dataset's transformed frames and the label.
+    `classes`, `labels` and `groups` mirror GestureDataset, so the video-grouped split
+    index and `create_dataloaders` work unchanged.
+    """
+    def __init__(self, frames, window=16, stride=8):
+        """
+        Parameters:
+            frames (GestureDataset): Frame dataset; its transform must return tensors (e.g. ToUint8Tensor).
+            window (int): Frames per clip.
+            stride (int): Frames between the starts of consecutive clips of a video.
+        """
+        self.frames = frames
+        self.window = window
+        self.stride = stride
+        self.classes = frames.classes
+        self.group_names = frames.group_names
+
+        by_group = {}
+        for idx, group in enumerate(frames.group_ids):
+            by_group.setdefault(int(group), []).append(idx)
+
+        clips = []
+        clip_groups = []
+        offsets = np.arange(window)
+        for group, indices in sorted(by_group.items()):
+            indices = np.asarray(sorted(indices, key=lambda i: (_frame_number(frames.image_path(i)), i)), dtype=np.int64)
+            for start in range(0, max(len(indices) - window, 0) + 1, stride):
+                clips.append(indices[np.minimum(start + offsets, len(indices) - 1)])
+                clip_groups.append(group)
+        self._clips = np.asarray(clips, dtype=np.int64).reshape(-1, window)
+        self._group_ids = np.asarray(clip_groups, dtype=np.int32)
+        self.labels = frames.labels[self._clips[:, 0]] if len(self._clips) else np.zeros(0, dtype=np.int32)
+
+    @property
+    def groups(self):
+        return [self.group_names[i] for i in self._group_ids]
+
+    @property
+    def frame_numbers(self):
+        # Position of each clip's first frame in its source video
+        return [_frame_number(self.frames.image_path(int(clip[0]))) for clip in self._clips]
+
+    def clip_indices(self, idx):
+        """Frame dataset indices of clip `idx`, in time order."""
+        return self._clips[idx]
+
+    def __len__(self):
+        return len(self._clips)
+
+    def __getitem__(self, idx):
+        clip = torch.stack([torch.as_tensor(self.frames[int(i)][0]) for i in self._clips[idx]])
+        return clip, int(self.labels[idx])
@@ -0,0 +1,138 @@
+import json
+import time
+import argparse
+import numpy as np
+import torch
+from simple_cnn import is_torchscript, load_model
+
+class EagerRunner:
+    """SimpleCNN rebuilt in Python from a checkpoint."""
+    backend = 'eager'
+
+    def __init__(self, path):
+        self.model, self.classes = load_model(path, 'cpu')
+
+    def __call__(self, inputs):
+        with torch.no_grad():
+            return self.model(torch.from_numpy(inputs)).numpy()
+
+class TorchScriptRunner:
+    """Model exported by export_model.py (or quant_prun.py); no model code needed."""
+    backend = 'torchscript'
+
+    def __init__(self, path):
+        extra_files = {'classes.json': '', 'meta.json': ''}
+        self.model = torch.jit.load(path, map_location='cpu', _extra_files=extra_files)
+        self.model.eval()
+        self.classes = json.loads(extra_files['classes.json'] or 'null')
+        self.meta = json.loads(extra_files['meta.json'] or 'null')
+
+    def __call__(self, inputs):
+        with torch.no_grad():
+            return self.model(torch.from_numpy(inputs)).numpy()
+
+class OnnxRunner:
+    """ONNX Runtime on the CPU execution provider."""
+    backend = 'onnxruntime'
+
+    def __init__(self, path):
+        import onnxruntime
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        props = self.session.get_modelmeta().custom_metadata_map
+        self.classes = json.loads(props.get('classes', 'null'))
+        self.meta = {key: json.loads(value) for key, value in props.items()}
+
+    def __call__(self, inputs):
+        return self.session.run(None, {self.input_name: inputs})[0]
+
+RUNNERS = {runner.backend: runner for runner in (EagerRunner, TorchScriptRunner, OnnxRunner)}
+
+def load_runner(path, backend=None):
+    """Load `path` with the given backend, or pick one from the file type."""
+    if backend is None:
+        if path.endswith('.onnx'):
+            backend = 'onnxruntime'
+        elif is_torchscript(path):
+            backend = 'torchscript'
+        else:
+            backend = 'eager'
+    return RUNNERS[backend](path)
+
+def check_agreement(outputs, atol=1e-3):
+    """
+    Compare every backend's logits with the first one.
+
+    Returns:
+        dict: Max absolute difference and top-1 agreement rate per backend.
+    """
+    names = list(outputs)
+    reference = outputs[names[0]]
+    result = {}
+    for name in names:
+        diff = float(np.abs(outputs[name] - reference).max())
+        top1 = float((outputs[name].argmax(1) == reference.argmax(1)).mean())
+        result[name] = {'max_abs_diff': diff, 'top1_agreement': top1, 'close': diff <= atol}
+    return result
+
+def profile_backend(path, backend, inputs, iterations=100, warmup=10):
+    """
+    Cold start (load + first inference) and steady-state latency for one backend.
+
+    Returns:
+        tuple: (report dict, logits of the first inference)
+    """
+    start = time.perf_counter()
+    runner = load_runner(path, backend)
+    load_ms = (time.perf_counter() - start) * 1000.0
+    first = runner(inputs)
+    cold_ms = (time.perf_counter() - start) * 1000.0
+
+    for _ in range(warmup):
+        runner(inputs)
+    timings = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        runner(inputs)
+        timings.append((time.perf_counter() - t0) * 1000.0)
+
+    return {
+        'load_ms': load_ms,
+        'cold_start_ms': cold_ms,
+        'latency_p50_ms': float(np.percentile(timings, 50)),
+        'latency_p99_ms': float(np.percentile(timings, 99)),
+    }, first
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run and compare eager, TorchScript and ONNX Runtime models.")
+    parser.add_argument("--eager", help="Checkpoint for the eager backend")
+    parser.add_argument("--torchscript", help="TorchScript file from export_model.py")
+    parser.add_argument("--onnx", help="ONNX file from export_model.py")
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--input-size", type=int, default=224)
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--atol", type=float, default=1e-3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    backends = [(name, path) for name, path in (('eager', args.eager), ('torchscript', args.torchscript), ('onnxruntime', args.onnx)) if path]
+    if not backends:
+        parser.error("Give at least one of --eager, --torchscript, --onnx")
+
+    inputs = np.random.default_rng(args.seed).standard_normal((args.batch_size, 3, args.input_size, args.input_size)).astype(np.float32)
+    outputs = {}
+    for name, path in backends:
+        try:
+            report, outputs[name] = profile_backend(path, name, inputs, args.iterations)
+        except ImportError as e:
+            print(f"{name}: unavailable ({e})")
+            continue
+        print(f"{name:<12} load {report['load_ms']:8.1f} ms  cold start {report['cold_start_ms']:8.1f} ms  "
+              f"p50 {report['latency_p50_ms']:7.2f} ms  p99 {report['latency_p99_ms']:7.2f} ms")
+
+    if len(outputs) > 1:
+        for name, row in check_agreement(outputs, args.atol).items():
+            status = "OK" if row['close'] else "MISMATCH"
+            print(f"{name:<12} max |diff| {row['max_abs_diff']:.2e}  top-1 agreement {row['top1_agreement']:.3f}  {status}")
@@ -0,0 +1,231 @@
+import time
+import queue
+import argparse
+import threading
+from collections import namedtuple
+from concurrent.futures import Future
+import cv2
+import numpy as np
+import torch
+from simple_cnn import load_model
+from fast_preprocess import FramePreprocessor
+
+Prediction = namedtuple('Prediction', ['stream_id', 'label', 'index', 'confidence', 'latency'])
+
+class InferenceEngine:
+    """
+    Serve SimpleCNN predictions for many camera streams from one model instance.
+
+    Producers call `submit(stream_id, frame)` from any thread and get a Future that
+    resolves to a `Prediction`. A single worker thread drains the request queue into
+    dynamic micro-batches: a batch is run as soon as it holds `max_batch_size` frames or
+    the oldest frame in it has waited `max_latency_ms`, whichever comes first. The most
+    recent prediction of each stream is also available through `latest(stream_id)`.
+    """
+    def __init__(self, model, class_labels, device='cpu', input_size=224, max_batch_size=32, max_latency_ms=10.0, queue_size=1024):
+        self.model = model
+        self.class_labels = class_labels
+        self.device = torch.device(device)
+        self.input_size = input_size
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency_ms / 1000.0
+        self._queue = queue.Queue(maxsize=queue_size)
+        # Frames are preprocessed straight into rows of one reusable batch buffer
+        self._preprocessor = FramePreprocessor(input_size)
+        self._batch = torch.empty((max_batch_size, 3, input_size, input_size), dtype=torch.float32)
+        self._latest = {}
+        self._thread = None
+        self._stopping = threading.Event()
+        self.batches = 0
+        self.frames = 0
+
+    @classmethod
+    def from_checkpoint(cls, model_path, class_labels=None, device='cpu', **kwargs):
+        model, classes = load_model(model_path, device)
+        if class_labels is None:
+            class_labels = classes or [f'Gesture{i + 1}' for i in range(model.classifier[-1].out_features)]
+        return cls(model, class_labels, device=device, **kwargs)
+
+    def start(self):
+        if self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='inference-engine', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._stopping.set()
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def submit(self, stream_id, frame, block=True):
+        """Queue a BGR frame for `stream_id` and return a Future for its Prediction."""
+        future = Future()
+        self._queue.put((stream_id, frame, time.perf_counter(), future), block=block)
+        return future
+
+    def latest(self, stream_id):
+        return self._latest.get(stream_id)
+
+    @property
+    def mean_batch_size(self):
+        return self.frames / self.batches if self.batches else 0.0
+
+    def _collect_batch(self):
+        try:
+            first = self._queue.get(timeout=0.1)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = first[2] + self.max_latency
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while not self._stopping.is_set() or not self._queue.empty():
+            batch = self._collect_batch()
+            if not batch:
+                continue
+            try:
+                rows = self._batch.numpy()
+                for i, (_, frame, _, _) in enumerate(batch):
+                    self._preprocessor(frame, out=rows[i])
+                with torch.no_grad():
+                    outputs = self.model(self._batch[:len(batch)].to(self.device))
+                    confidences, predicted = torch.max(torch.softmax(outputs, dim=1), 1)
+            except Exception as e:
+                for _, _, _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            done = time.perf_counter()
+            for (stream_id, _, enqueued, future), index, confidence in zip(batch, predicted.tolist(), confidences.tolist()):
+                prediction = Prediction(stream_id, self.class_labels[index], index, confidence, done - enqueued)
+                self._latest[stream_id] = prediction
+                future.set_result(prediction)
+            self.batches += 1
+            self.frames += len(batch)
+
+class SyntheticFrameSource:
+    """Endless stand-in for a camera: random-noise BGR frames with a moving square."""
+    def __init__(self, width=640, height=480, seed=0):
+        self.width = width
+        self.height = height
+        self.rng = np.random.default_rng(seed)
+
+    def __iter__(self):
+        t = 0
+        while True:
+            frame = self.rng.integers(0, 64, size=(self.height, self.width, 3), dtype=np.uint8)
+            x = (t * 7) % max(1, self.width - 100)
+            frame[100:200, x:x + 100] = 255
+            t += 1
+            yield frame
+
+class VideoFileSource:
+    """Replay a video file as a camera stream, looping at the end when `loop` is set."""
+    def __init__(self, video_path, loop=True):
+        self.video_path = video_path
+        self.loop = loop
+
+    def __iter__(self):
+        while True:
+            cap = cv2.VideoCapture(self.video_path)
+            produced = 0
+            try:
+                while True:
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    produced += 1
+                    yield frame
+            finally:
+                cap.release()
+            if not self.loop or produced == 0:
+                return
+
+def run_benchmark(engine, sources, duration=10.0, fps=None):
+    """
+    Drive `engine` with one producer thread per source for `duration` seconds.
+
+    Each producer paces itself to `fps` frames per second (as fast as possible when None).
+
+    Returns:
+        dict: Throughput, latency percentiles in ms and the mean micro-batch size.
+    """
+    latencies = []
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def produce(stream_id, source):
+        pending = []
+        interval = 1.0 / fps if fps else 0.0
+        next_at = time.perf_counter()
+        for frame in source:
+            now = time.perf_counter()
+            if now >= stop_at:
+                break
+            if interval:
+                if now < next_at:
+                    time.sleep(next_at - now)
+                next_at += interval
+            pending.append(engine.submit(stream_id, frame))
+        results = [f.result() for f in pending]
+        with lock:
+            latencies.extend(p.latency for p in results)
+
+    start = time.perf_counter()
+    frames_before, batches_before = engine.frames, engine.batches
+    threads = [threading.Thread(target=produce, args=(i, src)) for i, src in enumerate(sources)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    frames = engine.frames - frames_before
+    batches = engine.batches - batches_before
+    lat_ms = np.array(latencies) * 1000.0 if latencies else np.zeros(1)
+    return {
+        'streams': len(sources),
+        'frames': frames,
+        'throughput_fps': frames / elapsed,
+        'latency_p50_ms': float(np.percentile(lat_ms, 50)),
+        'latency_p99_ms': float(np.percentile(lat_ms, 99)),
+        'mean_batch_size': frames / batches if batches else 0.0,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark batched multi-stream inference without a camera.")
+    parser.add_argument("--model", default="gesture_model.pth")
+    parser.add_argument("--streams", type=int, default=8)
+    parser.add_argument("--fps", type=float, default=15.0, help="Frames per second per stream (0 for unthrottled)")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-latency-ms", type=float, default=10.0)
+    parser.add_argument("--video", help="Replay this video file on every stream instead of synthetic frames")
+    args = parser.parse_args()
+
+    engine = InferenceEngine.from_checkpoint(args.model, max_batch_size=args.max_batch_size, max_latency_ms=args.max_latency_ms)
+    if args.video:
+        sources = [VideoFileSource(args.video) for _ in range(args.streams)]
+    else:
+        sources = [SyntheticFrameSource(seed=i) for i in range(args.streams)]
+
+    with engine:
+        report = run_benchmark(engine, sources, args.duration, args.fps or None)
+    for key, value in report.items():
+        print(f"{key}: {value:.2f}" if isinstance(value, float) else f"{key}: {value}")
@@ -0,0 +1,138 @@
+import os
+import time
+import queue
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from download_dataset import file_links, download_all, DEFAULT_BASE_URL
+from data_preprocessing import (VIDEO_EXTENSIONS, MANIFEST_NAME, process_video, video_signature,
+                                load_manifest, save_manifest, init_extraction_worker)
+
+_DONE = object()
+
+def ingest(links, download_dir, output_base_folder, frame_interval=10, download_workers=8, extract_workers=None,
+           queue_size=16, base_url=DEFAULT_BASE_URL, dedup_threshold=None):
+    """
+    Download `links` and extract frames from each video as soon as it lands on disk.
+
+    Download threads hand finished files to a bounded queue; a dispatcher thread feeds
+    them to a process pool running `process_video`. When extraction falls behind, the
+    queue fills up and the download threads block until there is room again, so
+    neither side runs away from the other. If the dispatcher fails, blocked downloads
+    stop handing files over instead of waiting forever, and the error is raised once
+    the downloads have finished. The extraction manifest of
+    `process_videos_in_folder` is shared, so videos that were already extracted are skipped.
+    `dedup_threshold` drops near-duplicate frames as in `process_videos_in_folder`.
+
+    Returns:
+        dict: Summary with file/frame counts and per-stage and total wall times.
+
+    Raises:
+        RuntimeError: If the dispatcher stopped on an error.
+    """
+    os.makedirs(output_base_folder, exist_ok=True)
+    manifest_path = os.path.join(output_base_folder, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+    manifest_lock = threading.Lock()
+    pending = queue.Queue(maxsize=queue_size)
+    dispatch_stopped = threading.Event()
+    dispatch_errors = []
+    in_flight = threading.BoundedSemaphore(max(1, extract_workers or os.cpu_count() or 1) * 2)
+    summary = {'downloaded': 0, 'download_failed': 0, 'extracted': 0, 'extract_skipped': 0, 'extract_failed': 0, 'frames': 0, 'frames_dropped': 0}
+    timings = {}
+    start = time.perf_counter()
+
+    def on_extracted(future, video_file, signature):
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"Error processing {video_file}: {e}")
+            with manifest_lock:
+                summary['extract_failed'] += 1
+        else:
+            with manifest_lock:
+                manifest[video_file] = {'signature': signature, 'frames': result.frames, 'dropped': result.dropped}
+                save_manifest(manifest, manifest_path)
+                summary['extracted'] += 1
+                summary['frames'] += result.frames
+                summary['frames_dropped'] += result.dropped
+            print(f"Extracted {video_file}: {result.frames} frames")
+        finally:
+            in_flight.release()
+
+    def hand_over(item):
+        # Wait for room in the queue, but give up once nobody is left to empty it
+        while not dispatch_stopped.is_set():
+            try:
+                pending.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def dispatch(executor):
+        try:
+            dispatch_files(executor)
+        except BaseException as e:
+            print(f"Extraction dispatcher stopped: {e!r}")
+            dispatch_errors.append(e)
+        finally:
+            dispatch_stopped.set()
+
+    def dispatch_files(executor):
+        while True:
+            video_path = pending.get()
+            if video_path is _DONE:
+                break
+            video_file = os.path.basename(video_path)
+            if not video_file.endswith(VIDEO_EXTENSIONS):
+                continue
+            signature = video_signature(video_path, frame_interval, dedup_threshold)
+            output_folder = os.path.join(output_base_folder, os.path.splitext(video_file)[0])
+            with manifest_lock:
+                entry = manifest.get(video_file)
+            if entry is not None and entry.get('signature') == signature and os.path.isdir(output_folder):
+                summary['extract_skipped'] += 1
+                continue
+            # Cap the work handed to the pool so the queue, not the executor, absorbs the backlog
+            in_flight.acquire()
+            future = executor.submit(process_video, video_path, output_folder, frame_interval, dedup_threshold=dedup_threshold)
+            future.add_done_callback(lambda f, v=video_file, s=signature: on_extracted(f, v, s))
+
+    with ProcessPoolExecutor(max_workers=extract_workers, initializer=init_extraction_worker) as executor:
+        dispatcher = threading.Thread(target=dispatch, args=(executor,), name='ingest-dispatch')
+        dispatcher.start()
+        try:
+            results = download_all(links, download_dir, num_workers=download_workers, base_url=base_url, on_complete=hand_over)
+        finally:
+            hand_over(_DONE)
+        timings['download_s'] = time.perf_counter() - start
+        dispatcher.join()
+    if dispatch_errors:
+        raise RuntimeError("Extraction dispatcher failed, rerun to extract the remaining downloads") from dispatch_errors[0]
+    timings['total_s'] = time.perf_counter() - start
+
+    summary['downloaded'] = sum(1 for path in results.values() if path is not None)
+    summary['download_failed'] = len(results) - summary['downloaded']
+    summary.update(timings)
+    # Time extraction kept running after the last download finished
+    summary['extract_tail_s'] = timings['total_s'] - timings['download_s']
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download the corpus and extract frames concurrently.")
+    parser.add_argument("--download-dir", default="downloads")
+    parser.add_argument("--output-dir", default="processed_videos")
+    parser.add_argument("--frame-interval", type=int, default=10)
+    parser.add_argument("--download-workers", type=int, default=8)
+    parser.add_argument("--extract-workers", type=int, default=None, help="Extraction processes (default: all cores)")
+    parser.add_argument("--queue-size", type=int, default=16, help="Downloaded files allowed to wait for extraction")
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    parser.add_argument("--dedup-threshold", type=int, default=None, help="Drop frames within this many dHash bits of a recently kept frame")
+    args = parser.parse_args()
+
+    summary = ingest(file_links, args.download_dir, args.output_dir, args.frame_interval, args.download_workers,
+                     args.extract_workers, args.queue_size, args.base_url, args.dedup_threshold)
+    print(f"Downloaded {summary['downloaded']} files ({summary['download_failed']} failed), "
+          f"extracted {summary['extracted']} videos / {summary['frames']} frames "
+          f"({summary['extract_skipped']} unchanged, {summary['extract_failed']} failed)")
+    print(f"Download stage {summary['download_s']:.1f}s, extraction tail {summary['extract_tail_s']:.1f}s, total {summary['total_s']:.1f}s")
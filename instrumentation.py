@@ -0,0 +1,179 @@
+import os
+import sys
+import json
+import time
+import torch
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PHASES = ('prepare', 'forward', 'backward', 'optimizer')
+
+def peak_rss_mb():
+    """
+    Peak resident set size in MB of this process and of its finished child processes
+    (e.g. DataLoader workers of earlier epochs), or (None, None) where `resource` is missing.
+    """
+    if resource is None:
+        return None, None
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale)
+
+class NullInstrumentation:
+    """Stand-in used when instrumentation is off: every hook is a no-op."""
+    enabled = False
+
+    def start_epoch(self, phase, epoch, device=None):
+        pass
+
+    def data_ready(self):
+        pass
+
+    def mark(self, name):
+        pass
+
+    def end_step(self, batch_size):
+        pass
+
+    def end_epoch(self, **metrics):
+        return None
+
+    def close(self):
+        pass
+
+class Instrumentation:
+    """
+    Opt-in per-step timing for `train_model` / `evaluate_model`.
+
+    The loops call `start_epoch`, then per batch `data_ready` (time since the previous
+    step ended is DataLoader wait), `mark(name)` after each of the PHASES and `end_step`.
+    Every epoch gets a summary record (data wait vs compute split, per-phase totals,
+    samples/sec, peak RSS) that is printed and appended to `log_path` as JSON lines;
+    with `log_steps` every step is logged too. On CUDA each mark synchronizes the device
+    so the timings are real, which is why this is off by default.
+
+    Parameters:
+        log_path (str): JSONL file to append records to (None: print summaries only).
+        profile_steps (tuple): (start, end) global training steps to record with
+            `torch.profiler`; the Chrome trace is written to `profile_dir`.
+        profile_dir (str): Where profiler traces are written.
+        log_steps (bool): Also log one record per step.
+    """
+    enabled = True
+
+    def __init__(self, log_path=None, profile_steps=None, profile_dir='profiler_traces', log_steps=False):
+        self.log_path = log_path
+        self.profile_steps = tuple(profile_steps) if profile_steps else None
+        self.profile_dir = profile_dir
+        self.log_steps = log_steps
+        self.global_step = 0
+        self._log_file = open(log_path, 'a') if log_path else None
+        self._profiler = None
+        self._sync = False
+
+    def _now(self):
+        if self._sync:
+            torch.cuda.synchronize()
+        return time.perf_counter()
+
+    def _write(self, record):
+        if self._log_file is not None:
+            self._log_file.write(json.dumps(record) + '\n')
+            self._log_file.flush()
+
+    def start_epoch(self, phase, epoch, device=None):
+        self.phase = phase
+        self.epoch = epoch
+        self._sync = device is not None and torch.device(device).type == 'cuda'
+        self._totals = dict.fromkeys(('data_wait',) + PHASES, 0.0)
+        self._steps = 0
+        self._samples = 0
+        self._excluded = 0.0  # Time spent exporting profiler traces, kept out of the epoch's timings
+        self._epoch_start = self._last = self._now()
+
+    def data_ready(self):
+        now = self._now()
+        self._step = {'data_wait': now - self._last}
+        self._last = now
+        if self.phase == 'train' and self.profile_steps and self.global_step == self.profile_steps[0]:
+            self._start_profiler()
+
+    def mark(self, name):
+        now = self._now()
+        self._step[name] = now - self._last
+        self._last = now
+
+    def end_step(self, batch_size):
+        for name, seconds in self._step.items():
+            self._totals[name] += seconds
+        self._steps += 1
+        self._samples += batch_size
+        if self.log_steps:
+            record = {'event': 'step', 'phase': self.phase, 'epoch': self.epoch, 'step': self._steps, 'batch_size': batch_size}
+            record.update({f'{name}_ms': seconds * 1000.0 for name, seconds in self._step.items()})
+            self._write(record)
+        if self.phase == 'train':
+            self.global_step += 1
+            if self._profiler is not None:
+                self._profiler.step()
+                if self.global_step >= self.profile_steps[1]:
+                    start = time.perf_counter()
+                    self._stop_profiler()
+                    self._excluded += time.perf_counter() - start
+        self._last = self._now()
+
+    def end_epoch(self, **metrics):
+        """Log the epoch summary (plus `metrics`, e.g. loss and accuracy) and return it."""
+        elapsed = self._now() - self._epoch_start - self._excluded
+        compute = sum(self._totals[name] for name in PHASES)
+        rss, rss_children = peak_rss_mb()
+        record = {
+            'event': 'epoch',
+            'phase': self.phase,
+            'epoch': self.epoch,
+            'steps': self._steps,
+            'samples': self._samples,
+            'elapsed_s': elapsed,
+            'samples_per_sec': self._samples / max(elapsed, 1e-9),
+            'data_wait_s': self._totals['data_wait'],
+            'compute_s': compute,
+            'data_wait_fraction': self._totals['data_wait'] / max(elapsed, 1e-9),
+            'peak_rss_mb': rss,
+            'peak_rss_children_mb': rss_children,
+        }
+        record.update({f'{name}_s': self._totals[name] for name in PHASES if self._totals[name]})
+        record.update(metrics)
+        self._write(record)
+
+        split = " ".join(f"{name} {self._totals[name] / max(elapsed, 1e-9):.0%}" for name in ('data_wait',) + PHASES if self._totals[name])
+        memory = f" | peak RSS {rss:.0f} MB" if rss is not None else ""
+        print(f"[{self.phase}] {split} | {record['samples_per_sec']:.1f} samples/s{memory}")
+        return record
+
+    def _start_profiler(self):
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+        self._profiler = torch.profiler.profile(activities=activities, record_shapes=True, profile_memory=True)
+        self._profiler.__enter__()
+
+    def _stop_profiler(self):
+        profiler, self._profiler = self._profiler, None
+        profiler.__exit__(None, None, None)
+        os.makedirs(self.profile_dir, exist_ok=True)
+        trace_path = os.path.join(self.profile_dir, f'trace_steps{self.profile_steps[0]}-{self.profile_steps[1]}.json')
+        profiler.export_chrome_trace(trace_path)
+        print(profiler.key_averages().table(sort_by='self_cpu_time_total', row_limit=15))
+        print(f"Profiler trace written to {trace_path}")
+        self._write({'event': 'profile', 'steps': list(self.profile_steps), 'trace': trace_path})
+
+    def close(self):
+        if self._profiler is not None:
+            self._stop_profiler()
+        if self._log_file is not None:
+            self._log_file.close()
+            self._log_file = None
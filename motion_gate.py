@@ -0,0 +1,63 @@
+import cv2
+import torch
+
+class MotionGate:
+    """
+    Cheap keyframe detector for live video: decides whether a frame is worth a model pass.
+
+    Each frame is shrunk to a small grayscale thumbnail and compared with the thumbnail of
+    the last frame that was let through. While the mean absolute pixel difference stays
+    below `threshold` (0-255 scale) the caller should reuse its last prediction. Comparing
+    against the last keyframe, not the previous frame, means slow drift still triggers a
+    refresh eventually; `max_skip` forces one after that many skipped frames regardless.
+    """
+    def __init__(self, threshold=6.0, size=(64, 48), max_skip=30):
+        self.threshold = threshold
+        self.size = tuple(size)
+        self.max_skip = max_skip
+        self._keyframe = None
+        self._since_keyframe = 0
+        self.frames = 0
+        self.skipped = 0
+
+    def __call__(self, frame):
+        """Return True if `frame` (BGR uint8) differs enough from the last keyframe to run the model."""
+        self.frames += 1
+        small = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), self.size, interpolation=cv2.INTER_AREA)
+        if (self._keyframe is not None and self._since_keyframe < self.max_skip
+                and cv2.absdiff(small, self._keyframe).mean() < self.threshold):
+            self._since_keyframe += 1
+            self.skipped += 1
+            return False
+        self._keyframe = small
+        self._since_keyframe = 0
+        return True
+
+    @property
+    def skip_rate(self):
+        return self.skipped / max(self.frames, 1)
+
+    def report(self):
+        return f"motion gate: skipped {self.skipped}/{self.frames} frames ({self.skip_rate:.1%}) at threshold {self.threshold}"
+
+class PredictionSmoother:
+    """
+    Exponential moving average of class probabilities, so the displayed label does not
+    flicker on single-frame misclassifications. `alpha` is the weight of the newest
+    prediction; 1.0 disables smoothing.
+    """
+    def __init__(self, alpha=0.5):
+        self.alpha = alpha
+        self.probs = None
+
+    def update(self, logits):
+        """Fold in (1, num_classes) logits; returns the index of the smoothed top class."""
+        probs = torch.softmax(logits.float(), dim=1)[0]
+        if self.probs is None or self.alpha >= 1.0:
+            self.probs = probs
+        else:
+            self.probs = self.alpha * probs + (1 - self.alpha) * self.probs
+        return int(self.probs.argmax())
+
+    def reset(self):
+        self.probs = None
@@ -1,12 +1,203 @@
+import io
+import copy
+import json
+import time
+import argparse
+import numpy as np
 import torch
-from torch.quantization import quantize_dynamic
-from simple_cnn import SimpleCNN
+import torch.nn as nn
+from torch.utils.data import DataLoader, Subset
+from torchvision import transforms
+from torch.ao.quantization import get_default_qconfig_mapping
+from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+from gesture_dataset import GestureDataset
+from split_index import load_or_create_split_index, split_indices
+from simple_cnn import load_model, save_torchscript
 
-# Load your model
-num_classes = 5
-model = SimpleCNN(num_classes=num_classes)
-model.load_state_dict(torch.load('model.pth'))
+input_size = 224
 
-# Quantize the model
-model_quantized = quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
-torch.save(model_quantized.state_dict(), 'model_quantized.pth')
+# Deterministic preprocessing for calibration and evaluation
+eval_transform = transforms.Compose([
+    transforms.Resize((input_size, input_size)),
+    transforms.ToTensor(),
+    transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+])
+
+def _slice_batchnorm(bn, keep):
+    new_bn = nn.BatchNorm2d(len(keep), eps=bn.eps, momentum=bn.momentum, affine=bn.affine, track_running_stats=bn.track_running_stats)
+    if bn.affine:
+        new_bn.weight.data = bn.weight.data[keep].clone()
+        new_bn.bias.data = bn.bias.data[keep].clone()
+    if bn.track_running_stats:
+        new_bn.running_mean = bn.running_mean[keep].clone()
+        new_bn.running_var = bn.running_var[keep].clone()
+        new_bn.num_batches_tracked = bn.num_batches_tracked.clone()
+    return new_bn
+
+def prune_channels(model, ratio):
+    """
+    Structured pruning: drop the `ratio` fraction of output channels with the smallest L1
+    norm from every conv layer in `model.features`.
+
+    The following BatchNorm, the next conv's input channels and the first classifier
+    layer are sliced to match, so the result is a genuinely smaller dense model (not a
+    masked one). Returns a pruned copy; the input model is left untouched.
+    """
+    model = copy.deepcopy(model).cpu()
+    layers = list(model.features)
+    convs = [i for i, layer in enumerate(layers) if isinstance(layer, nn.Conv2d)]
+
+    for n, ci in enumerate(convs):
+        conv = layers[ci]
+        keep_count = max(1, int(round(conv.out_channels * (1 - ratio))))
+        importance = conv.weight.detach().abs().sum(dim=(1, 2, 3))
+        keep = torch.argsort(importance, descending=True)[:keep_count].sort().values
+
+        new_conv = nn.Conv2d(conv.in_channels, keep_count, conv.kernel_size, conv.stride, conv.padding, bias=conv.bias is not None)
+        new_conv.weight.data = conv.weight.data[keep].clone()
+        if conv.bias is not None:
+            new_conv.bias.data = conv.bias.data[keep].clone()
+        layers[ci] = new_conv
+
+        end = convs[n + 1] if n + 1 < len(convs) else len(layers)
+        for j in range(ci + 1, end):
+            if isinstance(layers[j], nn.BatchNorm2d):
+                layers[j] = _slice_batchnorm(layers[j], keep)
+
+        if n + 1 < len(convs):
+            nxt = layers[convs[n + 1]]
+            new_next = nn.Conv2d(keep_count, nxt.out_channels, nxt.kernel_size, nxt.stride, nxt.padding, bias=nxt.bias is not None)
+            new_next.weight.data = nxt.weight.data[:, keep].clone()
+            if nxt.bias is not None:
+                new_next.bias.data = nxt.bias.data.clone()
+            layers[convs[n + 1]] = new_next
+        else:
+            fc = model.classifier[0]
+            weight = fc.weight.data
+            if model.pool is None:
+                # Flattened CxHxW features: keep every spatial position of the kept channels
+                weight = weight.view(fc.out_features, conv.out_channels, -1)[:, keep].reshape(fc.out_features, -1)
+            else:
+                weight = weight[:, keep]
+            new_fc = nn.Linear(weight.shape[1], fc.out_features)
+            new_fc.weight.data = weight.clone()
+            new_fc.bias.data = fc.bias.data.clone()
+            model.classifier[0] = new_fc
+
+    model.features = nn.Sequential(*layers)
+    return model
+
+def quantization_backend():
+    engines = torch.backends.quantized.supported_engines
+    for engine in ('x86', 'fbgemm', 'qnnpack'):
+        if engine in engines:
+            return engine
+    raise RuntimeError(f"No supported quantization engine in {engines}")
+
+def quantize_static(model, calib_loader):
+    """
+    Post-training static int8 quantization, calibrated on `calib_loader`.
+
+    Uses FX graph mode, which inserts observers and fuses conv+ReLU automatically. In
+    SimpleCNN the BatchNorm comes after the ReLU, so it cannot be folded into the conv
+    weights and is kept as a quantized BatchNorm instead.
+    """
+    backend = quantization_backend()
+    torch.backends.quantized.engine = backend
+    model = copy.deepcopy(model).cpu().eval()
+    example_inputs = (next(iter(calib_loader))[0],)
+    prepared = prepare_fx(model, get_default_qconfig_mapping(backend), example_inputs)
+    with torch.no_grad():
+        for inputs, _ in calib_loader:
+            prepared(inputs)
+    return convert_fx(prepared)
+
+def serialized_size(model, example_input):
+    buffer = io.BytesIO()
+    with torch.no_grad():
+        torch.jit.save(torch.jit.trace(model, example_input), buffer)
+    return buffer.tell()
+
+def measure_latency(model, example_input, iterations=50, warmup=5):
+    """Mean and p90 single-batch latency in milliseconds."""
+    timings = []
+    with torch.no_grad():
+        for i in range(warmup + iterations):
+            start = time.perf_counter()
+            model(example_input)
+            if i >= warmup:
+                timings.append((time.perf_counter() - start) * 1000.0)
+    return float(np.mean(timings)), float(np.percentile(timings, 90))
+
+def measure_accuracy(model, loader):
+    correct = 0
+    total = 0
+    with torch.no_grad():
+        for inputs, labels in loader:
+            _, preds = torch.max(model(inputs), 1)
+            correct += (preds == labels).sum().item()
+            total += labels.size(0)
+    return correct / total if total else 0.0
+
+def compression_report(variants, eval_loader, example_input):
+    """Size, latency and accuracy for each (name, model) pair."""
+    report = {}
+    for name, model in variants:
+        model.eval()
+        mean_ms, p90_ms = measure_latency(model, example_input)
+        report[name] = {
+            'size_mb': serialized_size(model, example_input) / 1e6,
+            'latency_mean_ms': mean_ms,
+            'latency_p90_ms': p90_ms,
+            'accuracy': measure_accuracy(model, eval_loader),
+        }
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prune and statically quantize a trained SimpleCNN.")
+    parser.add_argument("--model", default="best_model2.pth", help="Checkpoint to compress")
+    parser.add_argument("--data-dir", default="processed_videos", help="GestureDataset used for calibration and evaluation")
+    parser.add_argument("--split-index", default="split_index.json", help="Split index written by train.py; calibration uses train samples, evaluation test samples")
+    parser.add_argument("--output", default="model_quantized.pt", help="TorchScript file loadable by simple_cnn.load_model")
+    parser.add_argument("--report", default="compression_report.json")
+    parser.add_argument("--prune-ratio", type=float, default=0.0, help="Fraction of conv channels to remove (0 disables pruning)")
+    parser.add_argument("--calib-samples", type=int, default=256)
+    parser.add_argument("--eval-samples", type=int, default=512, help="Test samples to evaluate on (0: the whole test split)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    model, classes = load_model(args.model, 'cpu')
+    dataset = GestureDataset(args.data_dir, transform=eval_transform)
+    if classes is None:
+        classes = dataset.classes
+
+    # Calibrate on training samples and evaluate on the held-out test split, so the accuracy
+    # comparison is not inflated by frames the model was trained on
+    train_idx, _, test_idx = split_indices(dataset, load_or_create_split_index(dataset, args.split_index, seed=args.seed))
+    rng = np.random.default_rng(args.seed)
+    calib_set = Subset(dataset, rng.permutation(train_idx)[:args.calib_samples].tolist())
+    eval_set = Subset(dataset, rng.permutation(test_idx)[:args.eval_samples or None].tolist())
+    print(f"Calibrating on {len(calib_set)} training samples, evaluating on {len(eval_set)} of {len(test_idx)} test samples")
+    calib_loader = DataLoader(calib_set, batch_size=args.batch_size, shuffle=False)
+    eval_loader = DataLoader(eval_set, batch_size=args.batch_size, shuffle=False)
+
+    example_input = torch.randn(1, 3, input_size, input_size)
+    variants = [('fp32', model)]
+    compressed = model
+    if args.prune_ratio > 0:
+        compressed = prune_channels(model, args.prune_ratio)
+        variants.append((f'pruned_{args.prune_ratio:g}', compressed))
+    quantized = quantize_static(compressed, calib_loader)
+    variants.append(('int8', quantized))
+
+    save_torchscript(quantized, args.output, example_input, classes)
+    print(f"Saved quantized model to {args.output}")
+
+    report = compression_report(variants, eval_loader, example_input)
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'variant':<16}{'size MB':>10}{'mean ms':>10}{'p90 ms':>10}{'accuracy':>10}")
+    for name, row in report.items():
+        print(f"{name:<16}{row['size_mb']:>10.2f}{row['latency_mean_ms']:>10.2f}{row['latency_p90_ms']:>10.2f}{row['accuracy']:>10.4f}")
@@ -0,0 +1,160 @@
+import time
+import threading
+from collections import deque
+
+class DropOldestQueue:
+    """
+    Bounded queue that never blocks producers: when full, the oldest item is discarded.
+
+    Keeps end-to-end latency bounded when a downstream stage falls behind, at the cost
+    of skipping stale frames. `dropped` counts the discarded items; `on_drop` is called
+    with each of them, e.g. to recycle its buffers.
+    """
+    def __init__(self, maxsize=2, on_drop=None):
+        self._items = deque()
+        self._maxsize = maxsize
+        self._cond = threading.Condition()
+        self._on_drop = on_drop
+        self.dropped = 0
+
+    def put(self, item):
+        dropped = None
+        with self._cond:
+            if len(self._items) >= self._maxsize:
+                dropped = self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+        if dropped is not None and self._on_drop is not None:
+            self._on_drop(dropped)
+
+    def get(self, timeout=None):
+        """Return the oldest item, or None if nothing arrived within `timeout` seconds."""
+        with self._cond:
+            if not self._items:
+                self._cond.wait(timeout)
+            if not self._items:
+                return None
+            return self._items.popleft()
+
+    def __len__(self):
+        return len(self._items)
+
+class StageStats:
+    """Frame counter for one pipeline stage; `fps()` reports the rate since the last call."""
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self._last_count = 0
+        self._last_time = time.perf_counter()
+
+    def tick(self):
+        self.count += 1
+
+    def fps(self):
+        now = time.perf_counter()
+        rate = (self.count - self._last_count) / max(now - self._last_time, 1e-9)
+        self._last_count = self.count
+        self._last_time = now
+        return rate
+
+def run_pipelined(cap, preprocess, infer, render, queue_size=2, report_interval=2.0, release=None):
+    """
+    Run capture, preprocess, inference and rendering as separate pipelined stages.
+
+    Capture, preprocess and inference each get their own thread; rendering stays on the
+    calling thread because most GUI backends (including `cv2.imshow`) require it. Stages
+    are connected by drop-oldest queues of `queue_size`, so the displayed prediction is
+    never more than a couple of frames behind the camera. An exception in any stage
+    stops the pipeline and is re-raised here once the threads have been joined.
+
+    Parameters:
+        cap (cv2.VideoCapture): Frame source.
+        preprocess (callable): frame -> model input.
+        infer (callable): model input -> prediction.
+        render (callable): (frame, prediction) -> False to stop the loop.
+        queue_size (int): Capacity of each inter-stage queue.
+        report_interval (float): Seconds between per-stage FPS / queue-depth reports.
+        release (callable): Called with each model input once inference is done with it
+            or when it is dropped unused, e.g. `FramePreprocessor(pooled=True).release`.
+
+    Returns:
+        dict: Frames processed per stage and frames dropped per queue.
+    """
+    stop = threading.Event()
+    frames = DropOldestQueue(queue_size)
+    release = release or (lambda model_input: None)
+    inputs = DropOldestQueue(queue_size, on_drop=lambda item: release(item[1]))
+    results = DropOldestQueue(queue_size)
+    stats = {name: StageStats(name) for name in ('capture', 'preprocess', 'infer', 'render')}
+    errors = []
+
+    def guarded(stage):
+        # A dead stage thread would otherwise leave the render loop polling an empty queue forever
+        def run():
+            try:
+                stage()
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+        run.__name__ = stage.__name__
+        return run
+
+    def capture_stage():
+        while not stop.is_set():
+            ret, frame = cap.read()
+            if not ret:
+                stop.set()
+                break
+            frames.put(frame)
+            stats['capture'].tick()
+
+    def preprocess_stage():
+        while not stop.is_set():
+            frame = frames.get(timeout=0.05)
+            if frame is None:
+                continue
+            inputs.put((frame, preprocess(frame)))
+            stats['preprocess'].tick()
+
+    def infer_stage():
+        while not stop.is_set():
+            item = inputs.get(timeout=0.05)
+            if item is None:
+                continue
+            frame, model_input = item
+            prediction = infer(model_input)
+            release(model_input)
+            results.put((frame, prediction))
+            stats['infer'].tick()
+
+    threads = [threading.Thread(target=guarded(fn), name=fn.__name__, daemon=True) for fn in (capture_stage, preprocess_stage, infer_stage)]
+    for t in threads:
+        t.start()
+
+    last_report = time.perf_counter()
+    try:
+        while not stop.is_set():
+            item = results.get(timeout=0.05)
+            if item is not None:
+                if render(*item) is False:
+                    break
+                stats['render'].tick()
+
+            now = time.perf_counter()
+            if now - last_report >= report_interval:
+                last_report = now
+                rates = " ".join(f"{name}={s.fps():.1f}fps" for name, s in stats.items())
+                print(f"{rates} | queues frames={len(frames)} inputs={len(inputs)} results={len(results)}"
+                      f" | dropped {frames.dropped}/{inputs.dropped}/{results.dropped}")
+    finally:
+        stop.set()
+        for t in threads:
+            t.join(timeout=1.0)
+    if errors:
+        raise errors[0]
+
+    return {
+        'processed': {name: s.count for name, s in stats.items()},
+        'dropped': {'frames': frames.dropped, 'inputs': inputs.dropped, 'results': results.dropped},
+    }
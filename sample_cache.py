@@ -0,0 +1,145 @@
+import os
+import shutil
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+
+def _attach(name):
+    # Workers only borrow the block; keep the resource tracker from unlinking it when they exit
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13 has no `track` argument
+        # Spawned and forkserver workers report to the parent's resource tracker, where this
+        # registration duplicates the owner's; unregistering here would drop the owner's entry
+        return shared_memory.SharedMemory(name=name)
+
+def cap_to_shm(budget_bytes, path='/dev/shm', fraction=0.5):
+    """
+    Limit a cache budget to `fraction` of the free space of the shared-memory mount, which
+    is often far smaller than RAM (64 MB by default in Docker). Returns `budget_bytes`
+    unchanged where `path` does not exist.
+    """
+    if budget_bytes <= 0 or not os.path.isdir(path):
+        return budget_bytes
+    available = int(shutil.disk_usage(path).free * fraction)
+    if budget_bytes > available:
+        print(f"Shared image cache reduced from {budget_bytes / 1024 ** 2:.0f} MB to {available / 1024 ** 2:.0f} MB to fit in {path}")
+        return available
+    return budget_bytes
+
+class SharedImageCache:
+    """
+    Fixed-budget LRU cache of decoded images in shared memory.
+
+    All images have the same `item_shape` (e.g. (256, 256, 3) uint8), so the byte budget
+    is split into equal slots. The slot table, LRU timestamps and pixel data all live in
+    shared memory guarded by one lock, so every DataLoader worker sees what the others
+    decoded. Create the cache in the main process before the workers start; it is
+    re-attached by name when the dataset is pickled into spawned workers.
+
+    The lock is a multiprocessing semaphore, which only works in workers started the same
+    way it was created: `mp_context` must match the DataLoader's `multiprocessing_context`
+    (None for both uses the default start method).
+    """
+    def __init__(self, num_items, item_shape, budget_bytes, dtype=np.uint8, mp_context=None):
+        self.num_items = num_items
+        self.item_shape = tuple(item_shape)
+        self.dtype = np.dtype(dtype)
+        self.item_bytes = int(np.prod(self.item_shape)) * self.dtype.itemsize
+        self.num_slots = int(min(num_items, budget_bytes // self.item_bytes))
+        if self.num_slots < 1:
+            raise ValueError(f"Cache budget of {budget_bytes} bytes cannot hold one {self.item_shape} image")
+
+        # Metadata layout (int64): [clock, used, slot_of_item[num_items], item_of_slot[num_slots], last_used[num_slots]]
+        meta_len = 2 + num_items + 2 * self.num_slots
+        self._meta_shm = shared_memory.SharedMemory(create=True, size=meta_len * 8)
+        self._data_shm = shared_memory.SharedMemory(create=True, size=self.num_slots * self.item_bytes)
+        self._lock = multiprocessing.get_context(mp_context).Lock()
+        self._owner_pid = os.getpid()
+        self._closed = False
+        self._map_views()
+        self._slot_of_item[:] = -1
+        self._item_of_slot[:] = -1
+        self._last_used[:] = 0
+        self._counters[:] = 0
+
+    def _map_views(self):
+        meta = np.ndarray((2 + self.num_items + 2 * self.num_slots,), dtype=np.int64, buffer=self._meta_shm.buf)
+        self._counters = meta[:2]
+        self._slot_of_item = meta[2:2 + self.num_items]
+        self._item_of_slot = meta[2 + self.num_items:2 + self.num_items + self.num_slots]
+        self._last_used = meta[2 + self.num_items + self.num_slots:]
+        self._data = np.ndarray((self.num_slots,) + self.item_shape, dtype=self.dtype, buffer=self._data_shm.buf)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for key in ('_meta_shm', '_data_shm', '_counters', '_slot_of_item', '_item_of_slot', '_last_used', '_data'):
+            del state[key]
+        state['_meta_name'] = self._meta_shm.name
+        state['_data_name'] = self._data_shm.name
+        return state
+
+    def __setstate__(self, state):
+        meta_name = state.pop('_meta_name')
+        data_name = state.pop('_data_name')
+        self.__dict__.update(state)
+        self._meta_shm = _attach(meta_name)
+        self._data_shm = _attach(data_name)
+        self._map_views()
+
+    def __len__(self):
+        return int(self._counters[1])
+
+    @property
+    def nbytes(self):
+        return self.num_slots * self.item_bytes
+
+    def get(self, idx):
+        """Return a private copy of the cached image for `idx`, or None on a miss."""
+        with self._lock:
+            slot = self._slot_of_item[idx]
+            if slot < 0:
+                return None
+            self._counters[0] += 1
+            self._last_used[slot] = self._counters[0]
+            # Copy under the lock: the slot may be evicted by another worker as soon as it is released
+            return self._data[slot].copy()
+
+    def put(self, idx, image):
+        """Insert `image` for `idx`, evicting the least recently used entry when the cache is full."""
+        if image.shape != self.item_shape:
+            raise ValueError(f"Expected an image of shape {self.item_shape}, got {image.shape}")
+        with self._lock:
+            if self._slot_of_item[idx] >= 0:
+                return
+            used = self._counters[1]
+            if used < self.num_slots:
+                slot = used
+                self._counters[1] += 1
+            else:
+                slot = int(np.argmin(self._last_used))
+                self._slot_of_item[self._item_of_slot[slot]] = -1
+            self._data[slot] = image
+            self._item_of_slot[slot] = idx
+            self._slot_of_item[idx] = slot
+            self._counters[0] += 1
+            self._last_used[slot] = self._counters[0]
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        # Drop the numpy views first, SharedMemory refuses to close while buffers are exported
+        for key in ('_counters', '_slot_of_item', '_item_of_slot', '_last_used', '_data'):
+            self.__dict__.pop(key, None)
+        self._meta_shm.close()
+        self._data_shm.close()
+        if self._owner_pid == os.getpid():
+            self._meta_shm.unlink()
+            self._data_shm.unlink()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
@@ -1,10 +1,25 @@
+import json
+import zipfile
 import torch
 import torch.nn as nn
 
+ARCHITECTURES = ('flatten', 'gap')
+
 class SimpleCNN(nn.Module):
-    def __init__(self, num_classes):
+    def __init__(self, num_classes, arch='flatten'):
+        """
+        Parameters:
+            num_classes (int): Number of output classes.
+            arch (str): 'flatten' is the original model, whose classifier starts with a
+                Linear over the flattened 128x56x56 feature map (~205M parameters, 224x224
+                input only). 'gap' adds a strided conv stage and global average pooling,
+                which brings the model down to ~0.5M parameters and accepts any input size.
+        """
         super(SimpleCNN, self).__init__()
-        self.features = nn.Sequential(
+        if arch not in ARCHITECTURES:
+            raise ValueError(f"Unknown architecture '{arch}', expected one of {ARCHITECTURES}")
+        self.arch = arch
+        layers = [
             nn.Conv2d(3, 64, kernel_size=3, stride=1, padding=1),
             nn.ReLU(inplace=True),
             nn.BatchNorm2d(64),  # Batch normalization
@@ -13,9 +28,21 @@ class SimpleCNN(nn.Module):
             nn.ReLU(inplace=True),
             nn.BatchNorm2d(128),  # Batch normalization
             nn.MaxPool2d(kernel_size=2, stride=2)
-        )
+        ]
+        if arch == 'gap':
+            layers += [
+                nn.Conv2d(128, 256, kernel_size=3, stride=2, padding=1),
+                nn.ReLU(inplace=True),
+                nn.BatchNorm2d(256),
+            ]
+            self.pool = nn.AdaptiveAvgPool2d(1)  # Global average pooling
+            in_features = 256
+        else:
+            self.pool = None
+            in_features = 128 * 56 * 56
+        self.features = nn.Sequential(*layers)
         self.classifier = nn.Sequential(
-            nn.Linear(128 * 56 * 56, 512),
+            nn.Linear(in_features, 512),
             nn.ReLU(inplace=True),
             nn.Dropout(p=0.5),  # Dropout with 50% probability
             nn.Linear(512, num_classes)
@@ -23,6 +50,88 @@ class SimpleCNN(nn.Module):
 
     def forward(self, x):
         x = self.features(x)
+        if self.pool is not None:
+            x = self.pool(x)
         x = x.view(x.size(0), -1)  # Flatten the tensor
         x = self.classifier(x)
         return x
+
+def checkpoint_payload(model, classes=None):
+    """The dict `save_checkpoint` writes: the weights plus the metadata `load_model` needs to rebuild the model."""
+    payload = {
+        'arch': model.arch,
+        'num_classes': model.classifier[-1].out_features,
+        'classes': list(classes) if classes is not None else None,
+        'state_dict': model.state_dict(),
+    }
+    if getattr(model, 'config', None):
+        payload['config'] = dict(model.config)
+    return payload
+
+def save_checkpoint(model, path, classes=None):
+    """Save `model` with the metadata `load_model` needs to rebuild it."""
+    torch.save(checkpoint_payload(model, classes), path)
+
+def load_checkpoint(path, map_location='cpu'):
+    """
+    Load a checkpoint and normalize it to a dict with 'arch', 'num_classes', 'classes' and 'state_dict'.
+
+    Understands both the current format written by `save_checkpoint` and the old bare
+    state_dicts, whose architecture is inferred from the first classifier layer.
+    """
+    checkpoint = torch.load(path, map_location=map_location)
+    if 'state_dict' in checkpoint and 'arch' in checkpoint:
+        return checkpoint
+
+    # Legacy checkpoint: a bare SimpleCNN state_dict
+    state_dict = checkpoint
+    in_features = state_dict['classifier.0.weight'].shape[1]
+    arch = 'flatten' if in_features == 128 * 56 * 56 else 'gap'
+    return {
+        'arch': arch,
+        'num_classes': state_dict['classifier.3.weight'].shape[0],
+        'classes': None,
+        'state_dict': state_dict,
+    }
+
+def build_model(checkpoint):
+    """Untrained model with the architecture described by a `load_checkpoint` dict."""
+    if checkpoint['arch'] == 'temporal':
+        from temporal_model import TemporalCNN
+        return TemporalCNN(num_classes=checkpoint['num_classes'], **checkpoint.get('config', {}))
+    return SimpleCNN(num_classes=checkpoint['num_classes'], arch=checkpoint['arch'])
+
+def save_torchscript(model, path, example_input, classes=None):
+    """Trace `model` (e.g. a pruned or quantized SimpleCNN) and save it with its class names."""
+    model.eval()
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example_input)
+    torch.jit.save(traced, path, _extra_files={'classes.json': json.dumps(list(classes) if classes is not None else None)})
+
+def is_torchscript(path):
+    # TorchScript archives carry the serialized code next to the tensors; torch.save archives do not
+    if not zipfile.is_zipfile(path):
+        return False
+    with zipfile.ZipFile(path) as archive:
+        return any('/code/' in name for name in archive.namelist())
+
+def load_model(path, device='cpu'):
+    """
+    Load a model for inference from any format this repo writes: `save_checkpoint`
+    (SimpleCNN or TemporalCNN), legacy bare state_dicts, or TorchScript from `save_torchscript` (pruned/quantized models).
+
+    Returns:
+        tuple: The model in eval mode and its class names (None when not recorded).
+    """
+    if is_torchscript(path):
+        extra_files = {'classes.json': ''}
+        model = torch.jit.load(path, map_location=device, _extra_files=extra_files)
+        model.eval()
+        return model, json.loads(extra_files['classes.json'] or 'null')
+
+    checkpoint = load_checkpoint(path, map_location=device)
+    model = build_model(checkpoint)
+    model.load_state_dict(checkpoint['state_dict'])
+    model.to(device)
+    model.eval()
+    return model, checkpoint['classes']
@@ -0,0 +1,159 @@
+import os
+import json
+from collections import defaultdict
+import numpy as np
+
+SPLITS = ('train', 'val', 'test')
+
+def sample_positions(dataset):
+    """Time position of each sample within its video: frame numbers when the dataset knows them, else sample order."""
+    positions = getattr(dataset, 'frame_numbers', None)
+    return list(positions) if positions is not None else list(range(len(dataset)))
+
+def _segment_cuts(positions, split_ratio):
+    """
+    Frame-number cut points [val_from, test_from] that divide one video into contiguous
+    train | val | test segments in `split_ratio`; None means the segment is empty.
+    """
+    positions = sorted(set(positions))
+    m = len(positions)
+    n_val = int(round(split_ratio[1] * m))
+    n_test = int(round(split_ratio[2] * m))
+    if m >= 3:
+        n_val = max(n_val, 1 if split_ratio[1] > 0 else 0)
+        n_test = max(n_test, 1 if split_ratio[2] > 0 else 0)
+    while n_val + n_test > max(m - 1, 0):
+        if n_val > 0:
+            n_val -= 1
+        else:
+            n_test -= 1
+    val_from = positions[m - n_val - n_test] if n_val else None
+    test_from = positions[m - n_test] if n_test else None
+    return [val_from, test_from]
+
+def build_split_index(dataset, split_ratio=(0.8, 0.1, 0.1), seed=42):
+    """
+    Assign whole source videos to train/val/test, stratified by gesture class.
+
+    Within each class the videos are shuffled with `seed` and divided by `split_ratio`,
+    so every frame of a video lands in the same split and each class appears in each
+    split in roughly the requested proportion.
+
+    A class with fewer videos than there are non-empty splits (e.g. the
+    `processed_videos/<video>/` layout, where each video is its own class) cannot be
+    split by video. Each of its videos is instead cut along time into contiguous
+    train | val | test segments, recorded as frame-number cut points under 'segments'.
+
+    Parameters:
+        dataset: Dataset with `classes`, `labels` and `groups` (source video per sample).
+        split_ratio (tuple): Train, validation and test fractions.
+        seed (int): Random seed for reproducibility.
+
+    Returns:
+        dict: JSON-serializable index mapping each group to its split.
+    """
+    class_groups = defaultdict(set)
+    group_positions = defaultdict(list)
+    for label, group, position in zip(dataset.labels, dataset.groups, sample_positions(dataset)):
+        class_groups[int(label)].add(group)
+        group_positions[group].append(position)
+
+    rng = np.random.default_rng(seed)
+    assignments = {}
+    segments = {}
+    needed = sum(1 for ratio in split_ratio if ratio > 0)
+    for label in sorted(class_groups):
+        groups = sorted(class_groups[label])
+        rng.shuffle(groups)
+        n = len(groups)
+        if n < needed:
+            for group in groups:
+                segments[group] = _segment_cuts(group_positions[group], split_ratio)
+            continue
+        n_val = int(round(split_ratio[1] * n))
+        n_test = int(round(split_ratio[2] * n))
+        # Small classes would otherwise round val/test down to nothing
+        if n >= 3:
+            n_val = max(n_val, 1 if split_ratio[1] > 0 else 0)
+            n_test = max(n_test, 1 if split_ratio[2] > 0 else 0)
+        # Keep at least one video for training, and prefer test over val when videos are scarce
+        while n_val + n_test > max(n - 1, 0):
+            if n_val > 0:
+                n_val -= 1
+            else:
+                n_test -= 1
+        for i, group in enumerate(groups):
+            if i < n_val:
+                assignments[group] = 'val'
+            elif i < n_val + n_test:
+                assignments[group] = 'test'
+            else:
+                assignments[group] = 'train'
+
+    return {
+        'seed': seed,
+        'split_ratio': list(split_ratio),
+        'classes': list(dataset.classes),
+        'groups': assignments,
+        'segments': segments,
+    }
+
+def save_split_index(index, path):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def load_split_index(path):
+    with open(path) as f:
+        return json.load(f)
+
+def load_or_create_split_index(dataset, path, split_ratio=(0.8, 0.1, 0.1), seed=42):
+    """Load the split index at `path`, building and saving it first if it does not exist yet."""
+    if os.path.exists(path):
+        return load_split_index(path)
+    index = build_split_index(dataset, split_ratio, seed)
+    save_split_index(index, path)
+    return index
+
+def split_indices(dataset, index):
+    """
+    Sample indices of `dataset` for each split in `index`.
+
+    Samples from videos the index does not know about (added after it was built) are
+    left out of every split rather than silently placed where they could leak. Videos
+    split along time go to the segment their frame number falls in.
+
+    Raises:
+        ValueError: If a split with a non-zero ratio ends up without samples.
+
+    Returns:
+        tuple: Train, validation and test index lists.
+    """
+    splits = {name: [] for name in SPLITS}
+    unknown = set()
+    segments = index.get('segments', {})
+    positions = sample_positions(dataset) if segments else None
+    for i, group in enumerate(dataset.groups):
+        if group in segments:
+            val_from, test_from = segments[group]
+            position = positions[i]
+            if test_from is not None and position >= test_from:
+                splits['test'].append(i)
+            elif val_from is not None and position >= val_from:
+                splits['val'].append(i)
+            else:
+                splits['train'].append(i)
+            continue
+        split = index['groups'].get(group)
+        if split is None:
+            unknown.add(group)
+        else:
+            splits[split].append(i)
+    if unknown:
+        print(f"Split index does not cover {len(unknown)} videos; their frames are excluded. Delete the index to rebuild it.")
+    for name, ratio in zip(SPLITS, index['split_ratio']):
+        if ratio > 0 and not splits[name]:
+            raise ValueError(f"The {name} split is empty ({len(dataset)} samples in {len(set(dataset.groups))} videos). "
+                             f"Add more data, or delete the split index if it predates the current data.")
+    return tuple(splits[name] for name in SPLITS)
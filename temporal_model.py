@@ -0,0 +1,109 @@
+import torch
+import torch.nn as nn
+from simple_cnn import SimpleCNN, load_checkpoint
+
+class TemporalCNN(nn.Module):
+    """
+    Clip classifier: the 'gap' SimpleCNN trunk embeds every frame, a small temporal
+    convolution head mixes the embeddings over time and averages them into one prediction.
+
+    Input is a (B, T, 3, H, W) clip batch, any T. `embed` and `classify_embeddings` expose
+    the two halves so `StreamingClassifier` can cache per-frame embeddings.
+    """
+    arch = 'temporal'
+
+    def __init__(self, num_classes, window=16, hidden=256):
+        """
+        Parameters:
+            num_classes (int): Number of output classes.
+            window (int): Clip length the model is trained on (used by ClipDataset and streaming).
+            hidden (int): Channels of the temporal head.
+        """
+        super(TemporalCNN, self).__init__()
+        frame_model = SimpleCNN(num_classes, arch='gap')
+        self.features = frame_model.features
+        self.pool = frame_model.pool
+        self.embed_dim = frame_model.classifier[0].in_features
+        self.config = {'window': window, 'hidden': hidden}
+        self.temporal = nn.Sequential(
+            nn.Conv1d(self.embed_dim, hidden, kernel_size=3, padding=1),
+            nn.ReLU(inplace=True),
+            nn.BatchNorm1d(hidden),
+            nn.Conv1d(hidden, hidden, kernel_size=3, padding=2, dilation=2),
+            nn.ReLU(inplace=True),
+            nn.BatchNorm1d(hidden),
+        )
+        self.classifier = nn.Sequential(
+            nn.Dropout(p=0.5),
+            nn.Linear(hidden, num_classes)
+        )
+
+    def embed(self, frames):
+        """(N, 3, H, W) frames -> (N, embed_dim) embeddings."""
+        return self.pool(self.features(frames)).flatten(1)
+
+    def classify_embeddings(self, embeddings):
+        """(B, T, embed_dim) embeddings in time order -> (B, num_classes) logits."""
+        x = self.temporal(embeddings.transpose(1, 2))
+        return self.classifier(x.mean(dim=2))
+
+    def forward(self, clips):
+        b, t = clips.shape[:2]
+        embeddings = self.embed(clips.flatten(0, 1)).view(b, t, -1)
+        return self.classify_embeddings(embeddings)
+
+    def load_frame_weights(self, path):
+        """Initialize the per-frame trunk from a trained 'gap' SimpleCNN checkpoint."""
+        checkpoint = load_checkpoint(path)
+        if checkpoint['arch'] != 'gap':
+            raise ValueError(f"Frame weights must come from a 'gap' SimpleCNN, got '{checkpoint['arch']}'")
+        self.features.load_state_dict({k[len('features.'):]: v for k, v in checkpoint['state_dict'].items() if k.startswith('features.')})
+
+class StreamingClassifier:
+    """
+    Sliding-window inference over a live frame stream.
+
+    Each pushed frame costs one pass of the per-frame trunk: its embedding goes into a
+    ring buffer holding the last `window` embeddings, and only the temporal head is rerun
+    over the buffer. With `frame_interval` > 1 only every n-th frame is embedded (match the
+    `frame_interval` the training frames were extracted with) and the frames in between
+    reuse the last prediction.
+    """
+    def __init__(self, model, window=None, min_frames=None, frame_interval=1):
+        self.model = model.eval()
+        self.window = window or model.config['window']
+        self.min_frames = min(min_frames or self.window, self.window)
+        self.frame_interval = frame_interval
+        param = next(model.parameters())
+        self.buffer = torch.zeros(self.window, model.embed_dim, device=param.device, dtype=param.dtype)
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.frames_seen = 0
+        self.last_output = None
+
+    def __call__(self, frame):
+        """
+        Push one (3, H, W) or (1, 3, H, W) frame.
+
+        Returns:
+            torch.Tensor: (1, num_classes) logits over the current window, or None until `min_frames` frames are buffered.
+        """
+        self.frames_seen += 1
+        if (self.frames_seen - 1) % self.frame_interval:
+            return self.last_output
+        if frame.dim() == 3:
+            frame = frame.unsqueeze(0)
+
+        with torch.no_grad():
+            self.buffer[self.count % self.window] = self.model.embed(frame)[0]
+            self.count += 1
+            if self.count < self.min_frames:
+                return None
+            # Oldest slot first: the head is order-sensitive
+            n = min(self.count, self.window)
+            start = self.count % self.window if self.count >= self.window else 0
+            order = (torch.arange(n, device=self.buffer.device) + start) % self.window
+            self.last_output = self.model.classify_embeddings(self.buffer[order].unsqueeze(0))
+        return self.last_output
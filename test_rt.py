@@ -1,59 +1,123 @@
 # test_real_time.py
 
+import argparse
 import torch
 import cv2
-from torchvision import transforms
-from PIL import Image
-from simple_cnn import SimpleCNN
+from simple_cnn import load_model
+from temporal_model import StreamingClassifier
+from motion_gate import MotionGate, PredictionSmoother
+from rt_pipeline import run_pipelined
+from fast_preprocess import FramePreprocessor
 
 # Parameters
 model_path = "gesture_model.pth"
 input_size = 224  # Image size expected by the model
-num_classes = 5  # Adjust based on your dataset
 device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
 
-# Transformations
-transform = transforms.Compose([
-    transforms.Resize((input_size, input_size)),
-    transforms.ToTensor(),
-    transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
-])
+# Transformations: BGR frame -> normalized NCHW tensor in one resize and one multiply-add per channel
+# (see fast_preprocess.py for the parity check against the old torchvision/PIL transform)
+preprocessor = FramePreprocessor(input_size)
 
-# Load model
-model = SimpleCNN(num_classes=num_classes)
-model.load_state_dict(torch.load(model_path, map_location=device))
-model.to(device)
-model.eval()
-
-# Class labels
+# Class labels, used for legacy checkpoints that do not store their own
 class_labels = ['Gesture1', 'Gesture2', 'Gesture3', 'Gesture4', 'Gesture5',  # Update with actual class names
                 'Gesture6', 'Gesture7', 'Gesture8', 'Gesture9', 'Gesture10']
 
-# Start webcam
-cap = cv2.VideoCapture(0)
-
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        break
-
-    # Convert frame to PIL Image
-    pil_image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-    input_image = transform(pil_image).unsqueeze(0).to(device)
+def preprocess(frame):
+    model_input = preprocessor(frame)
+    on_device = model_input.to(device)
+    if on_device is not model_input:
+        preprocessor.release(model_input)  # The device copy owns the data now
+    return on_device
 
-    # Prediction
+def predict(model, input_image, smoother=None):
     with torch.no_grad():
         output = model(input_image)
+        if output is None:
+            return "..."  # Clip model still filling its window
+        if smoother is not None:
+            return class_labels[smoother.update(output)]
         _, predicted = torch.max(output, 1)
-        predicted_label = class_labels[predicted.item()]
+        return class_labels[predicted.item()]
+
+class GatedPredictor:
+    """
+    Runs the model only on frames the motion gate lets through; the others are not even
+    preprocessed and reuse the last label. `preprocess` and `infer` can run on different
+    threads (pipelined mode): each only touches its own state.
+    """
+    def __init__(self, model, gate=None, smoother=None):
+        self.model = model
+        self.gate = gate
+        self.smoother = smoother
+        self.label = "..."
+
+    def preprocess(self, frame):
+        if self.gate is not None and not self.gate(frame):
+            return None
+        return preprocess(frame)
+
+    def infer(self, model_input):
+        if model_input is not None:
+            self.label = predict(self.model, model_input, self.smoother)
+        return self.label
 
+def render(frame, predicted_label):
     # Display the prediction
     cv2.putText(frame, f'Prediction: {predicted_label}', (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2, cv2.LINE_AA)
     cv2.imshow("Gesture Recognition", frame)
 
     # Press 'q' to exit
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
+    return not (cv2.waitKey(1) & 0xFF == ord('q'))
+
+def run_sequential(predictor, cap):
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+
+        predicted_label = predictor.infer(predictor.preprocess(frame))
+        if not render(frame, predicted_label):
+            break
+
+def main():
+    parser = argparse.ArgumentParser(description="Real-time gesture recognition from a webcam.")
+    parser.add_argument("--pipelined", action="store_true", help="Run capture, preprocess, inference and display as separate stages")
+    parser.add_argument("--queue-size", type=int, default=2, help="Capacity of each inter-stage queue in pipelined mode")
+    parser.add_argument("--clip-frame-interval", type=int, default=1,
+                        help="For a clip model, feed every n-th camera frame (match the frame_interval its training frames were extracted with)")
+    parser.add_argument("--motion-threshold", type=float, default=6.0,
+                        help="Mean grayscale difference (0-255) from the last keyframe below which a frame reuses the last prediction; 0 runs every frame")
+    parser.add_argument("--max-skip", type=int, default=30, help="Run the model at least once every this many frames")
+    parser.add_argument("--smoothing", type=float, default=0.5, help="Weight of the newest prediction in the displayed label's moving average; 1 disables smoothing")
+    args = parser.parse_args()
+
+    global class_labels, preprocessor
+    model, classes = load_model(model_path, device)
+    if classes is not None:
+        class_labels = classes
+    gate = MotionGate(args.motion_threshold, max_skip=args.max_skip) if args.motion_threshold > 0 else None
+    if getattr(model, 'arch', None) == 'temporal':
+        # Clip model: embed each new frame once and rerun only the temporal head over the window
+        model = StreamingClassifier(model, frame_interval=args.clip_frame_interval)
+        gate = None  # The window must see evenly spaced frames, not just keyframes
+    predictor = GatedPredictor(model, gate, PredictionSmoother(args.smoothing) if args.smoothing < 1 else None)
+
+    # Start webcam
+    cap = cv2.VideoCapture(0)
+    try:
+        if args.pipelined:
+            # Inputs wait in a queue and are read by the inference thread while new frames are
+            # preprocessed: take each from a free-list and recycle it only once inference is done
+            preprocessor = FramePreprocessor(input_size, pooled=True)
+            run_pipelined(cap, predictor.preprocess, predictor.infer, render, queue_size=args.queue_size,
+                          release=preprocessor.release)
+        else:
+            run_sequential(predictor, cap)
+    finally:
+        cap.release()
+        cv2.destroyAllWindows()
+        if gate is not None:
+            print(gate.report())
 
-cap.release()
-cv2.destroyAllWindows()
+if __name__ == "__main__":
+    main()
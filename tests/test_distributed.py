@@ -0,0 +1,51 @@
+import os
+import json
+import torch
+import torch.nn as nn
+import torch.distributed as dist
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data import TensorDataset
+import train
+from distributed import launch_local, reduce_metrics
+from simple_cnn import SimpleCNN
+from utils import create_dataloaders
+
+def _two_rank_worker(rank, world_size, result_dir):
+    # Rank r contributes loss r + 1, r correct predictions and r + 2 samples
+    loss, acc = reduce_metrics(torch.tensor(float(rank + 1)), torch.tensor(rank), rank + 2)
+
+    # Record which ranks write the best-model checkpoint
+    save_checkpoint = train.save_checkpoint
+    def recording_save(model, path, classes=None):
+        open(os.path.join(result_dir, f'saved_by_rank{rank}'), 'w').close()
+        save_checkpoint(model, path, classes)
+    train.save_checkpoint = recording_save
+
+    torch.manual_seed(0)
+    dataset = TensorDataset(torch.randn(48, 3, 32, 32), torch.randint(0, 3, (48,)))
+    train_loader, val_loader, _ = create_dataloaders(dataset, 8, num_workers=0, distributed=True)
+    model = DistributedDataParallel(SimpleCNN(num_classes=3, arch='gap'))
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.01)
+    scheduler = torch.optim.lr_scheduler.StepLR(optimizer, step_size=7)
+    train.train_model(model, train_loader, val_loader, nn.CrossEntropyLoss(), optimizer, scheduler, 2, 'cpu',
+                      checkpoint_path=os.path.join(result_dir, 'best.pth'))
+
+    # DDP keeps the replicas identical
+    checksum = torch.tensor([sum(p.double().sum().item() for p in model.parameters())], dtype=torch.float64)
+    gathered = [torch.zeros_like(checksum) for _ in range(world_size)]
+    dist.all_gather(gathered, checksum)
+    with open(os.path.join(result_dir, f'rank{rank}.json'), 'w') as f:
+        json.dump({'loss': loss, 'acc': acc, 'checksums': [g.item() for g in gathered]}, f)
+
+def test_two_ranks_on_localhost(tmp_path):
+    launch_local(_two_rank_worker, 2, str(tmp_path))
+
+    results = [json.loads((tmp_path / f'rank{rank}.json').read_text()) for rank in range(2)]
+    for result in results:
+        # Sums over both ranks: loss 1 + 2, corrects 0 + 1, samples 2 + 3
+        assert result['loss'] == 3 / 5
+        assert result['acc'] == 1 / 5
+        assert result['checksums'][0] == result['checksums'][1]
+    assert (tmp_path / 'best.pth').exists()
+    assert (tmp_path / 'saved_by_rank0').exists()
+    assert not (tmp_path / 'saved_by_rank1').exists()
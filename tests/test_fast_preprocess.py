@@ -0,0 +1,47 @@
+import time
+import torch
+from fast_preprocess import FramePreprocessor, check_parity, synthetic_frame
+from rt_pipeline import run_pipelined
+
+def test_parity_with_torchvision_reference():
+    worst_mean, _ = check_parity(frames=3)
+    assert worst_mean < 0.05
+
+def test_default_output_is_reused():
+    preprocessor = FramePreprocessor(64)
+    assert preprocessor(synthetic_frame(seed=0)) is preprocessor(synthetic_frame(seed=1))
+
+class FakeCapture:
+    """cv2.VideoCapture stand-in delivering `count` distinct frames every `interval` seconds."""
+    def __init__(self, count, interval):
+        self.frames = [synthetic_frame(160, 120, seed=i) for i in range(4)]
+        self.count = count
+        self.interval = interval
+        self.read_count = 0
+
+    def read(self):
+        if self.read_count >= self.count:
+            return False, None
+        time.sleep(self.interval)
+        self.read_count += 1
+        return True, self.frames[self.read_count % len(self.frames)]
+
+def test_pooled_inputs_are_not_overwritten_during_inference():
+    # Capture runs 10x faster than inference, so preprocessing keeps producing while the forward pass reads its input
+    preprocessor = FramePreprocessor(64, pooled=True)
+    inferred = []
+    overwritten = []
+
+    def infer(model_input):
+        snapshot = model_input.clone()
+        time.sleep(0.05)
+        inferred.append(1)
+        overwritten.append(not torch.equal(model_input, snapshot))
+        return 'label'
+
+    run_pipelined(FakeCapture(150, 0.005), preprocessor, infer, lambda frame, label: None,
+                  queue_size=2, report_interval=60.0, release=preprocessor.release)
+    assert inferred
+    assert not any(overwritten)
+    # Buffers are recycled: the pool stays at queue slots plus the few in flight
+    assert preprocessor.num_buffers <= 2 + 3
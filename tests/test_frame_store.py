@@ -0,0 +1,29 @@
+import os
+import warnings
+import pytest
+from PIL import Image
+from torch.utils.data import DataLoader
+from frame_store import pack_frames, PackedGestureDataset
+
+def test_pack_empty_corpus_raises(tmp_path):
+    (tmp_path / 'hello').mkdir()
+    with pytest.raises(ValueError, match="No images"):
+        pack_frames(str(tmp_path), str(tmp_path / 'packed'))
+    assert not os.path.exists(tmp_path / 'packed.npy')
+
+def test_packed_samples_collate_without_warnings(tmp_path):
+    for gesture in ('hello', 'thanks'):
+        folder = tmp_path / 'data' / gesture / 'v1'
+        folder.mkdir(parents=True)
+        for i in range(2):
+            Image.new('RGB', (8, 8), (i, 0, 0)).save(folder / f'frame_{i}.png')
+    assert pack_frames(str(tmp_path / 'data'), str(tmp_path / 'packed'), size=(8, 8)) == 4
+
+    dataset = PackedGestureDataset(str(tmp_path / 'packed'))
+    image, _ = dataset[0]
+    assert image.flags.writeable
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        images, labels = next(iter(DataLoader(dataset, batch_size=4)))
+    assert images.shape == (4, 8, 8, 3)
+    assert sorted(labels.tolist()) == [0, 0, 1, 1]
@@ -0,0 +1,23 @@
+import os
+from PIL import Image
+from gesture_dataset import GestureDataset, INDEX_NAME
+
+def make_frames(data_dir, layout):
+    for gesture, videos in layout.items():
+        for video, count in videos.items():
+            folder = os.path.join(data_dir, gesture, video)
+            os.makedirs(folder)
+            for i in range(count):
+                Image.new('RGB', (8, 8)).save(os.path.join(folder, f'frame_{i}.jpg'))
+
+def test_truncated_index_is_rebuilt(tmp_path, capsys):
+    make_frames(tmp_path, {'hello': {'v1': 3}, 'thanks': {'v2': 2}})
+    assert len(GestureDataset(str(tmp_path))) == 5
+    index_path = tmp_path / INDEX_NAME
+    index_path.write_bytes(index_path.read_bytes()[:20])
+
+    dataset = GestureDataset(str(tmp_path))
+    assert len(dataset) == 5
+    assert dataset.classes == ['hello', 'thanks']
+    assert "Ignoring unreadable dataset index" in capsys.readouterr().out
+    assert len(GestureDataset(str(tmp_path))) == 5
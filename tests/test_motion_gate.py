@@ -0,0 +1,22 @@
+import numpy as np
+import torch
+from fast_preprocess import synthetic_frame
+from motion_gate import MotionGate, PredictionSmoother
+
+def test_gate_skips_noise_and_passes_scene_cut():
+    # A still scene with sensor noise, then a cut to a different scene
+    rng = np.random.default_rng(0)
+    scenes = [synthetic_frame(seed=0)] * 50 + [synthetic_frame(seed=1)] * 50
+    gate = MotionGate()
+    passed = []
+    for i, scene in enumerate(scenes):
+        noisy = np.clip(scene.astype(np.int16) + rng.integers(-4, 5, scene.shape), 0, 255).astype(np.uint8)
+        if gate(noisy):
+            passed.append(i)
+    assert 0 in passed and 50 in passed
+    assert gate.skip_rate > 0.5
+
+def test_smoother_ignores_single_frame_flicker():
+    smoother = PredictionSmoother(alpha=0.3)
+    labels = [smoother.update(torch.tensor([[2.0, 0.0]] if i != 5 else [[0.0, 2.0]])) for i in range(10)]
+    assert labels == [0] * 10
@@ -0,0 +1,18 @@
+import time
+import pytest
+from rt_pipeline import run_pipelined
+
+class EndlessCapture:
+    """cv2.VideoCapture stand-in that never runs out of frames."""
+    def read(self):
+        time.sleep(0.005)
+        return True, 'frame'
+
+def test_stage_error_stops_pipeline_and_is_raised():
+    def infer(model_input):
+        raise RuntimeError("inference failed")
+
+    start = time.perf_counter()
+    with pytest.raises(RuntimeError, match="inference failed"):
+        run_pipelined(EndlessCapture(), lambda frame: frame, infer, lambda frame, prediction: True)
+    assert time.perf_counter() - start < 5.0
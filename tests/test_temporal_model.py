@@ -0,0 +1,15 @@
+import torch
+from temporal_model import TemporalCNN, StreamingClassifier
+
+def test_streaming_matches_full_window():
+    torch.manual_seed(0)
+    model = TemporalCNN(num_classes=5, window=8).eval()
+    stream = torch.randn(20, 3, 64, 64)
+    streaming = StreamingClassifier(model)
+    for t, frame in enumerate(stream):
+        output = streaming(frame)
+        if t + 1 < 8:
+            assert output is None
+    with torch.no_grad():
+        expected = model(stream[-8:].unsqueeze(0))
+    assert (output - expected).abs().max().item() < 1e-4
@@ -1,7 +1,11 @@
+import contextlib
 import torch
-from torch.utils.data import random_split, DataLoader
+from torch.utils.data import random_split, DataLoader, Subset
+from torch.utils.data.distributed import DistributedSampler
+from split_index import load_or_create_split_index, split_indices
+from distributed import ShardSampler, main_process_first
 
-def create_dataloaders(dataset, batch_size, split_ratio=(0.8, 0.1, 0.1), num_workers=4, seed=42):
+def create_dataloaders(dataset, batch_size, split_ratio=(0.8, 0.1, 0.1), num_workers=4, seed=42, split_index=None, distributed=False):
     """
     Create train, validation, and test dataloaders with a given split ratio and batch size.
 
@@ -11,12 +15,27 @@ def create_dataloaders(dataset, batch_size, split_ratio=(0.8, 0.1, 0.1), num_wor
         split_ratio (tuple): The ratio to split the dataset into train, validation, and test sets.
         num_workers (int): Number of workers for data loading.
         seed (int): Random seed for reproducibility.
+        split_index (str): Path of a video-grouped split index (see split_index.py), created
+            on first use. When given, whole videos are assigned to splits instead of
+            splitting at frame level, so no video contributes frames to more than one set.
+            Classes with too few videos are split into contiguous time segments instead.
+            An empty validation or test split raises ValueError.
+        distributed (bool): Shard the splits across the ranks of the initialized process
+            group: DistributedSampler for training (call `set_epoch` every epoch), unpadded
+            shards for validation and test. `batch_size` is per rank.
 
     Returns:
         tuple: Train, validation, and test dataloaders.
     """
     # Set seed for reproducibility
     torch.manual_seed(seed)
+
+    if split_index is not None:
+        # Only rank 0 may create the index file; the other ranks read what it wrote
+        with main_process_first() if distributed else contextlib.nullcontext():
+            index = load_or_create_split_index(dataset, split_index, split_ratio, seed)
+        train_dataset, val_dataset, test_dataset = (Subset(dataset, indices) for indices in split_indices(dataset, index))
+        return _make_loaders(train_dataset, val_dataset, test_dataset, batch_size, num_workers, seed, distributed)
     
     # Calculate sizes for each split
     total_size = len(dataset)
@@ -26,10 +45,22 @@ def create_dataloaders(dataset, batch_size, split_ratio=(0.8, 0.1, 0.1), num_wor
     
     # Ensure the split sizes are correct
     assert train_size + val_size + test_size == total_size, "Split sizes do not match the total dataset size."
+    for name, size, ratio in zip(('train', 'val', 'test'), (train_size, val_size, test_size), split_ratio):
+        if ratio > 0 and size == 0:
+            raise ValueError(f"The {name} split of {total_size} samples is empty; add more data or change split_ratio.")
     
     # Split the dataset
     train_dataset, val_dataset, test_dataset = random_split(dataset, [train_size, val_size, test_size])
     
+    return _make_loaders(train_dataset, val_dataset, test_dataset, batch_size, num_workers, seed, distributed)
+
+def _make_loaders(train_dataset, val_dataset, test_dataset, batch_size, num_workers, seed=42, distributed=False):
+    if distributed:
+        train_loader = DataLoader(train_dataset, batch_size=batch_size, sampler=DistributedSampler(train_dataset, shuffle=True, seed=seed), num_workers=num_workers)
+        val_loader = DataLoader(val_dataset, batch_size=batch_size, sampler=ShardSampler(val_dataset), num_workers=num_workers)
+        test_loader = DataLoader(test_dataset, batch_size=batch_size, sampler=ShardSampler(test_dataset), num_workers=num_workers)
+        return train_loader, val_loader, test_loader
+
     # Create dataloaders
     train_loader = DataLoader(train_dataset, batch_size=batch_size, shuffle=True, num_workers=num_workers)
     val_loader = DataLoader(val_dataset, batch_size=batch_size, shuffle=False, num_workers=num_workers)